@@ -0,0 +1,167 @@
+'''
+SolarLinUCBAgentClass.py: Contains the SolarLinUCBAgent class.
+'''
+
+# Python imports.
+import numpy as np
+from collections import defaultdict
+
+# Other imports.
+from simple_rl.agents.AgentClass import Agent
+
+class SolarLinUCBAgent(Agent):
+    '''
+    LinUCB (Li et al., WWW 2010) over the bandit arms of a SolarOOMDP, for large
+    (e.g. dual axis, small panel_step) arm grids. Every arm sees the same context
+    (the state features), so:
+        - Arms that were never played still have A = I and b = 0, and are scored
+          from their initial theta and |x| alone, without storing their matrices.
+        - Played arms keep A^-1 and theta stacked in arrays, updated incrementally
+          (Sherman-Morrison), and are all scored with one batched contraction.
+    Each step costs O(arms * d + played arms * d^2), the second term dominating
+    with image contexts (d = img_dims^2 + 2).
+    '''
+
+    def __init__(self, actions, name="LinUCB", rand_init=True, context_size=1, alpha=1.5):
+        '''
+        Args:
+            actions (list): Contains a string for each action.
+            name (str)
+            rand_init (bool): If true, the theta of each arm starts random (until it's played).
+            context_size (int)
+            alpha (float): Uncertainty parameter.
+        '''
+        Agent.__init__(self, name, actions)
+        self.alpha = alpha
+        self.context_size = context_size
+        self.rand_init = rand_init
+        self.action_ids = dict((action, action_id) for action_id, action in enumerate(self.actions))
+        self.prev_context = None
+        self.step_number = 0
+        self._init_action_model(rand_init)
+
+    def get_parameters(self):
+        '''
+        Returns:
+            (dict) key=param_name (str) --> val=param_val (object).
+        '''
+        param_dict = defaultdict(int)
+
+        param_dict["rand_init"] = self.rand_init
+        param_dict["context_size"] = self.context_size
+        param_dict["alpha"] = self.alpha
+
+        return param_dict
+
+    def _init_action_model(self, rand_init=True):
+        '''
+        Summary:
+            Initializes model parameters.
+        '''
+        num_arms, d = len(self.actions), self.context_size
+
+        # Theta of every arm (A x d), the only per-arm array kept for unplayed arms.
+        self.theta = np.random.random((num_arms, d)) if rand_init else np.zeros((num_arms, d))
+
+        # Played arms: row of each arm (-1 if unplayed), and their stacked A^-1 (P x d x d) and b (P x d).
+        # The stacks grow by doubling, only the first num_played rows are in use.
+        self.played_rows = -np.ones(num_arms, dtype=int)
+        self.played_arms = np.zeros(0, dtype=int)
+        self.act_inv = np.zeros((0, d, d))
+        self.b = np.zeros((0, d))
+        self.num_played = 0
+
+    def _add_played_arm(self, action_id):
+        '''
+        Returns:
+            (int): The row of the new played arm @action_id in the stacks.
+        '''
+        if self.num_played == len(self.played_arms):
+            capacity, d = max(2 * self.num_played, 16), self.context_size
+            self.played_arms = np.concatenate([self.played_arms, np.zeros(capacity - self.num_played, dtype=int)])
+            self.act_inv = np.concatenate([self.act_inv, np.zeros((capacity - self.num_played, d, d))])
+            self.b = np.concatenate([self.b, np.zeros((capacity - self.num_played, d))])
+
+        row = self.num_played
+        self.played_rows[action_id] = row
+        self.played_arms[row] = action_id
+        self.act_inv[row] = np.identity(self.context_size)
+        self.num_played += 1
+
+        return row
+
+    def _compute_scores(self, context):
+        '''
+        Args:
+            context (np.array): The context (size d) shared by all arms.
+
+        Returns:
+            (np.array): The UCB score of each arm.
+        '''
+        estimated_rewards = self.theta.dot(context)
+
+        # Unplayed arms: x^T I x.
+        uncertainty = np.empty(len(self.actions))
+        uncertainty.fill(context.dot(context))
+
+        # Played arms: x^T A^-1 x, batched.
+        if self.num_played > 0:
+            played_arms = self.played_arms[:self.num_played]
+            uncertainty[played_arms] = self.act_inv[:self.num_played].dot(context).dot(context)
+
+        return estimated_rewards + self.alpha * np.sqrt(np.maximum(uncertainty, 0.0))
+
+    def update(self, reward):
+        '''
+        Args:
+            reward (float)
+
+        Summary:
+            Updates the model of self.prev_action according to self.prev_context and @reward.
+        '''
+        action_id = self.action_ids[self.prev_action]
+        row = self.played_rows[action_id]
+        if row < 0:
+            row = self._add_played_arm(action_id)
+
+        # Sherman-Morrison: (A + x x^T)^-1 = A^-1 - (A^-1 x)(A^-1 x)^T / (1 + x^T A^-1 x), A^-1 being symmetric.
+        context = self.prev_context
+        act_inv = self.act_inv[row]
+        act_inv_x = act_inv.dot(context)
+        act_inv -= np.outer(act_inv_x, act_inv_x) / (1.0 + context.dot(act_inv_x))
+
+        self.b[row] += reward * context
+        self.theta[action_id] = act_inv.dot(self.b[row])
+
+    def act(self, state, reward):
+        '''
+        Args:
+            state (State)
+            reward (float)
+
+        Returns:
+            (str): action.
+        '''
+        # Update previous context-action pair.
+        if self.prev_action is not None:
+            self.update(reward)
+
+        # Compute best action (the first of the best scores).
+        context = np.array(state.features(), dtype=float).ravel()
+        best_action = self.actions[int(np.argmax(self._compute_scores(context)))]
+
+        # Update prev pointers.
+        self.prev_action = best_action
+        self.prev_context = context
+        self.step_number += 1
+
+        return best_action
+
+    def reset(self):
+        '''
+        Summary:
+            Resets the agent back to its tabula rasa config.
+        '''
+        Agent.reset(self)
+        self.prev_context = None
+        self._init_action_model(self.rand_init)
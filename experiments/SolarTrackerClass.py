@@ -4,7 +4,6 @@ SolarTrackerClass.py: Contains the SolarTracker class.
 
 # Python imports.
 import numpy as np
-import random
 
 # Local imports.
 import solarOOMDP.solar_helpers as sh
@@ -12,12 +11,25 @@ import solarOOMDP.solar_helpers as sh
 class SolarTracker(object):
     ''' Class for a Solar Tracker '''
 
-    def __init__(self, tracker, panel_step, actions, dual_axis=False):
+    def __init__(self, tracker, panel_step, actions, dual_axis=False, batch_tracker=None):
+        '''
+        Args:
+            tracker (lambda): state --> (sun_alt, sun_az)
+            panel_step (int)
+            actions (list of str): Bandit actions of the form "ns,ew".
+            dual_axis (bool)
+            batch_tracker (lambda): list of states --> (np.array sun_alts, np.array sun_azs). Optional.
+        '''
         self.tracker = tracker
+        self.batch_tracker = batch_tracker
         self.panel_step = panel_step
         self.dual_axis = dual_axis
         self.actions = actions
 
+        # The arm normals never change, so build them once (A x 3).
+        arm_angles = np.array([[float(x) for x in action.split(",")] for action in self.actions]).reshape(-1, 2)
+        self.arm_normals = sh._compute_panel_normal_vectors(arm_angles[:, 0], arm_angles[:, 1])
+
     def get_policy(self):
         return self._policy
 
@@ -31,24 +43,32 @@ class SolarTracker(object):
             (str): Action in the set SolarOOMDPClass.ACTIONS
         '''
 
-        # Compute sun vec and initial panel vec.
+        # Compute sun vec.
         sun_alt, sun_az = self.tracker(state)
         sun_vec = sh._compute_sun_vector(sun_alt, sun_az)
-        panel_ew, panel_ns = state.get_panel_angle_ew(), state.get_panel_angle_ns()
-        best_action = sh._compute_panel_normal_vector(panel_ns, panel_ew)
-        max_cos_sim = float("-inf")
 
         # Find action that minimizes cos difference to estimate of sun vector.
-        for action in self.actions:
-
-            # Grab new normal vector.
-            new_panel_ns, new_panel_ew = [float(x) for x in action.split(",")]
-            new_panel_normal_vec = sh._compute_panel_normal_vector(new_panel_ns, new_panel_ew)
-            
-            cos_sim = np.dot(sun_vec, new_panel_normal_vec)
-            if cos_sim > max_cos_sim:
-                best_action = action
-                max_cos_sim = cos_sim
-
-        return best_action
+        cos_sims = np.dot(self.arm_normals, sun_vec)
+
+        return self.actions[np.argmax(cos_sims)]
+
+    def policy_batch(self, states):
+        '''
+        Args:
+            states (list of SolarOOMDP states)
+
+        Returns:
+            (list of str): The action _policy would choose in each state (arms tied
+                up to rounding error may be broken differently).
+        '''
+        if self.batch_tracker is not None:
+            sun_alts, sun_azs = self.batch_tracker(states)
+        else:
+            sun_alts, sun_azs = np.array([self.tracker(state) for state in states]).reshape(-1, 2).T
+
+        # Score every (state, arm) pair with one matmul.
+        sun_vecs = sh._compute_sun_vectors(sun_alts, sun_azs)
+        cos_sims = np.dot(sun_vecs, self.arm_normals.T)
+
+        return [self.actions[i] for i in np.argmax(cos_sims, axis=1)]
 
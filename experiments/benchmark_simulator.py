@@ -0,0 +1,191 @@
+#!/usr/bin/env python
+'''
+Micro- and macro-benchmarks of the solar simulator.
+
+Times the simulator hot paths and end-to-end steps/sec in each mode, and
+writes the results to a json file so runs on different commits can be compared:
+
+    python benchmark_simulator.py -out=bench_new.json -compare=bench_old.json
+'''
+
+# Python imports.
+import argparse
+import datetime
+import json
+import platform
+import random
+import subprocess
+import time
+import numpy as np
+from pytz import timezone
+
+# Other imports.
+from Pysolar import solar
+from simple_rl.agents import FixedPolicyAgent
+import solar_experiments as se
+import tracking_baselines as tb
+from SolarTrackerClass import SolarTracker
+from SolarLinUCBAgentClass import SolarLinUCBAgent
+
+# Benchmark params.
+loc = "nola"
+panel_step = 20
+time_per_step = 20.0
+
+def _time_call(func, number, repeats=3):
+    '''
+    Args:
+        func (lambda): Called with no arguments.
+        number (int): Calls per repeat.
+        repeats (int)
+
+    Returns:
+        (dict): Mean and best time per call (microseconds) over the repeats.
+    '''
+    per_call = []
+    for _ in xrange(repeats):
+        start = time.time()
+        for _ in xrange(number):
+            func()
+        per_call.append((time.time() - start) / number * 1e6)
+
+    return {"mean_us":round(float(np.mean(per_call)), 3), "best_us":round(min(per_call), 3), "calls":number * repeats}
+
+def _make_mdp(percept_type, dual_axis):
+    return se._make_mdp(loc, percept_type, panel_step=panel_step, dual_axis=dual_axis, time_per_step=time_per_step, seed=0)
+
+def run_micro_benchmarks(number):
+    '''
+    Args:
+        number (int): Calls per repeat of each benchmark.
+
+    Returns:
+        (dict): benchmark name --> timing (see _time_call).
+    '''
+    results = {}
+
+    # MDP internals (dual axis, image mode so the image is rendered).
+    solar_mdp = _make_mdp("image", dual_axis=True)
+    state = solar_mdp.get_init_state()
+    bandit_action = solar_mdp.get_bandit_actions()[len(solar_mdp.get_bandit_actions()) / 2]
+    sun_alt, sun_az = solar_mdp.ephemeris.get_local_sun_angles(0)
+
+    results["SolarOOMDP._reward_func"] = _time_call(lambda : solar_mdp._reward_func(state, bandit_action), number)
+    results["SolarOOMDP._reward_func[incremental]"] = _time_call(lambda : solar_mdp._reward_func(state, "panel_forward_ew"), number)
+    results["SolarOOMDP._compute_optimal_reward"] = _time_call(lambda : solar_mdp._compute_optimal_reward(sun_alt, sun_az), number)
+    results["SolarOOMDP.reward_all_arms"] = _time_call(lambda : solar_mdp.reward_all_arms(state), number)
+    results["SolarOOMDP._create_sun_image"] = _time_call(lambda : solar_mdp._create_sun_image(sun_az, sun_alt, 0.0, 0.0, 0), number)
+    results["SolarOOMDP._get_cloud_transmittance"] = _time_call(solar_mdp._get_cloud_transmittance, number)
+
+    def _transition():
+        if solar_mdp.step_index > 2000:
+            solar_mdp.reset()
+        solar_mdp._transition_func(state, bandit_action)
+    results["SolarOOMDP._transition_func"] = _time_call(_transition, number)
+    solar_mdp.reset()
+
+    # Trackers.
+    tracker = SolarTracker(tb.grena_tracker, panel_step, solar_mdp.get_bandit_actions(), dual_axis=True, batch_tracker=tb.grena_tracker_batch)
+    results["SolarTracker._policy"] = _time_call(lambda : tracker._policy(state), number)
+
+    # LinUCB decision (score all arms + update the last one) on a 1 degree dual axis grid.
+    fine_mdp = se._make_mdp(loc, "angles", panel_step=1, dual_axis=True, time_per_step=time_per_step, seed=0)
+    fine_state = fine_mdp.get_init_state()
+    lin_ucb_agent = SolarLinUCBAgent(fine_mdp.get_bandit_actions(), context_size=fine_mdp.get_num_state_feats(), alpha=2.0)
+    results["SolarLinUCBAgent.act[" + str(len(fine_mdp.get_bandit_actions())) + " arms]"] = _time_call(lambda : lin_ucb_agent.act(fine_state, 1.0), number)
+    results["tracking_baselines.grena_tracker"] = _time_call(lambda : tb.grena_tracker(state), number)
+    utc_time = state.get_date_time()
+    results["Pysolar.GetAltitude+GetAzimuth"] = _time_call(lambda : (solar.GetAltitude(state.get_latitude(), state.get_longitude(), utc_time),
+                                                                    solar.GetAzimuth(state.get_latitude(), state.get_longitude(), utc_time)), max(number / 10, 1))
+
+    # A year's worth (8760) of distinct hourly states, batched (steps of an hourly MDP, whose clock skips the nights).
+    hourly_mdp = se._make_mdp(loc, "angles", panel_step=panel_step, dual_axis=True, time_per_step=60.0, seed=0)
+    year_states = [hourly_mdp._create_compact_state(0.0, 0.0, step) for step in xrange(24 * 365)]
+    results["tracking_baselines.grena_tracker_batch[year]"] = _time_call(lambda : tb.grena_tracker_batch(year_states), 1)
+    results["SolarTracker.policy_batch[year]"] = _time_call(lambda : tracker.policy_batch(year_states), 1)
+
+    # Actuator energy.
+    panel = solar_mdp.panel
+    angle = np.radians(30.0)
+    step_rad = np.radians(panel_step)
+    results["Panel.get_rotation_energy_for_axis"] = _time_call(lambda : panel.get_rotation_energy_for_axis("ew", angle, step_rad), number)
+    results["Panel.get_move_energy_for_axis"] = _time_call(lambda : panel.get_move_energy_for_axis("ew", angle, angle + step_rad), number)
+
+    return results
+
+def run_macro_benchmarks(steps):
+    '''
+    Args:
+        steps (int): Steps simulated per mode.
+
+    Returns:
+        (dict): mode --> steps per second of the grena tracker acting in the MDP.
+    '''
+    results = {}
+    for percept_type in ["angles", "cloudy_angles", "clear_image", "image"]:
+        for dual_axis in [False, True]:
+            random.seed(0)
+            solar_mdp = _make_mdp(percept_type, dual_axis)
+            tracker = SolarTracker(tb.grena_tracker, panel_step, solar_mdp.get_bandit_actions(), dual_axis=dual_axis)
+            agent = FixedPolicyAgent(tracker.get_policy(), name="grena-tracker")
+
+            state, total_reward = solar_mdp.get_init_state(), 0.0
+            start = time.time()
+            for _ in xrange(steps):
+                reward, state = solar_mdp.execute_agent_action(agent.act(state, 0))
+                total_reward += reward
+            seconds = time.time() - start
+
+            mode = percept_type + ("-dual" if dual_axis else "-single")
+            results[mode] = {"steps_per_sec":round(steps / seconds, 1), "steps":steps, "total_reward":round(total_reward, 6)}
+
+    return results
+
+def _get_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"]).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _print_comparison(results, old_results):
+    print "\n--- Compared to " + str(old_results.get("commit")) + " ---"
+    for name, timing in sorted(results["micro"].items()):
+        if name in old_results.get("micro", {}):
+            print "\t" + name + ": " + str(round(old_results["micro"][name]["best_us"] / timing["best_us"], 2)) + "x"
+    for mode, timing in sorted(results["macro"].items()):
+        if mode in old_results.get("macro", {}):
+            print "\t" + mode + ": " + str(round(timing["steps_per_sec"] / old_results["macro"][mode]["steps_per_sec"], 2)) + "x"
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-out", type = str, default = "benchmark_results.json", nargs = '?', help = "Json file the results are written to.")
+    parser.add_argument("-compare", type = str, default = None, nargs = '?', help = "Json file of an earlier run to compare against.")
+    parser.add_argument("-number", type = int, default = 1000, nargs = '?', help = "Calls per repeat of each micro-benchmark.")
+    parser.add_argument("-steps", type = int, default = 2000, nargs = '?', help = "Steps per mode of the macro-benchmarks.")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    results = {"commit":_get_commit(),
+               "date":datetime.datetime.now().isoformat(),
+               "python":platform.python_version(),
+               "numpy":np.__version__,
+               "micro":run_micro_benchmarks(args.number),
+               "macro":run_macro_benchmarks(args.steps)}
+
+    out_file = open(args.out, "w")
+    json.dump(results, out_file, indent=2, sort_keys=True)
+    out_file.close()
+
+    for name, timing in sorted(results["micro"].items()):
+        print name + ": " + str(timing["best_us"]) + "us"
+    for mode, timing in sorted(results["macro"].items()):
+        print mode + ": " + str(timing["steps_per_sec"]) + " steps/sec"
+    print "Results written to " + args.out
+
+    if args.compare is not None:
+        _print_comparison(results, json.load(open(args.compare, "r")))
+
+if __name__ == "__main__":
+    main()
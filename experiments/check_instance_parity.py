@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+'''
+Checks that the ways of running a multi-instance experiment simulate the same instances.
+
+Runs the deterministic agents (their rewards only depend on the instance) of a
+usa_avg experiment, where each instance has its own location:
+    - sequentially, every agent through every instance (as run_agents_on_mdp does),
+    - instance by instance (as the workers of run_instances_in_parallel do),
+    - all agents together through each instance (as run_agents_in_lockstep does),
+and compares the rewards they write, per agent and instance:
+
+    python check_instance_parity.py -instances=3 -steps=200
+'''
+
+# Python imports.
+import argparse
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# Other imports.
+from simple_rl.experiments import Experiment
+from simple_rl.run_experiments import run_single_agent_on_mdp
+import solar_experiments as se
+
+def _read_rewards(exp_directory, agents):
+    '''
+    Returns:
+        (dict): agent name --> list of np.arrays, the rewards of each instance.
+    '''
+    rewards = {}
+    for agent in agents:
+        with open(os.path.join(exp_directory, str(agent) + ".csv")) as results_file:
+            rewards[str(agent)] = [np.array([float(r) for r in line.strip().strip(",").split(",")]) for line in results_file if line.strip()]
+    return rewards
+
+def _make_experiment(agents, solar_mdp, instances, steps, results_dir):
+    return Experiment(agents=agents,
+                        mdp=solar_mdp,
+                        params={"instances":instances, "episodes":1, "steps":steps},
+                        is_episodic=False,
+                        clear_old_results=True,
+                        dir_for_plot=results_dir)
+
+def run_sequential(experiment_kwargs, seed, steps, results_dir):
+    '''
+    Returns:
+        (dict): See _read_rewards.
+    '''
+    agents, solar_mdp = se.setup_experiment(seed=seed, **experiment_kwargs)
+    experiment = _make_experiment(agents, solar_mdp, experiment_kwargs["instances"], steps, results_dir)
+
+    # The loop of run_agents_on_mdp (without the plots).
+    for agent in agents:
+        for instance in xrange(experiment_kwargs["instances"]):
+            run_single_agent_on_mdp(agent, solar_mdp, 1, steps, experiment)
+            agent.reset()
+            solar_mdp.end_of_instance()
+
+    return _read_rewards(experiment.exp_directory, agents)
+
+def run_per_instance(experiment_kwargs, seed, steps, results_dir):
+    '''
+    Returns:
+        (dict): See _read_rewards.
+    '''
+    rewards = {}
+    for instance in xrange(experiment_kwargs["instances"]):
+        job = (experiment_kwargs, instance, seed, 1, steps, 1, os.path.join(results_dir, str(instance)), None, False)
+        agents, _ = se.setup_experiment(seed=seed, **experiment_kwargs)
+        for name, instance_rewards in _read_rewards(se._run_instance(job), agents).items():
+            rewards.setdefault(name, []).extend(instance_rewards)
+
+    return rewards
+
+def run_lockstep(experiment_kwargs, seed, steps, results_dir):
+    '''
+    Returns:
+        (dict): See _read_rewards.
+    '''
+    agents, solar_mdp = se.setup_experiment(seed=seed, **experiment_kwargs)
+    experiment = _make_experiment(agents, solar_mdp, experiment_kwargs["instances"], steps, results_dir)
+    se._run_instances_in_lockstep(agents, solar_mdp, experiment_kwargs["instances"], 1, steps, experiment)
+
+    return _read_rewards(experiment.exp_directory, agents)
+
+def compare(name, rewards, other_rewards):
+    '''
+    Returns:
+        (bool): True if @rewards and @other_rewards match for every agent and instance.
+    '''
+    match = True
+    for agent in sorted(rewards.keys()):
+        for instance, (instance_rewards, other_instance_rewards) in enumerate(zip(rewards[agent], other_rewards[agent])):
+            if not np.array_equal(instance_rewards, other_instance_rewards):
+                first_step = np.flatnonzero(instance_rewards != other_instance_rewards)[0] if len(instance_rewards) == len(other_instance_rewards) else 0
+                print "\t" + name + ": " + agent + " differs on instance " + str(instance) + " from step " + str(first_step) + \
+                        " (" + str(round(instance_rewards.sum(), 5)) + " vs " + str(round(other_instance_rewards.sum(), 5)) + ")."
+                match = False
+        if len(rewards[agent]) != len(other_rewards[agent]):
+            print "\t" + name + ": " + agent + " has " + str(len(rewards[agent])) + " vs " + str(len(other_rewards[agent])) + " instances."
+            match = False
+
+    print name + ": " + ("match" if match else "MISMATCH")
+    return match
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-loc", type = str, default = "usa_avg", nargs = '?', help = "Location (usa_avg draws one per instance).")
+    parser.add_argument("-percept", type = str, default = "angles", nargs = '?', help = "One of {angles, image, clear_image}.")
+    parser.add_argument("-instances", type = int, default = 3, nargs = '?', help = "Number of instances.")
+    parser.add_argument("-steps", type = int, default = 200, nargs = '?', help = "Steps per instance.")
+    parser.add_argument("-seed", type = int, default = 0, nargs = '?', help = "Seeds the location draws.")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    experiment_kwargs = {"percept_type":args.percept, "loc":args.loc, "dual_axis":True, "panel_step":20, "time_per_step":20.0, "reflective_index":0.55, "instances":args.instances}
+
+    results_dir = tempfile.mkdtemp(prefix="parity-")
+    try:
+        sequential = run_sequential(experiment_kwargs, args.seed, args.steps, os.path.join(results_dir, "sequential"))
+        per_instance = run_per_instance(experiment_kwargs, args.seed, args.steps, os.path.join(results_dir, "per_instance"))
+        lockstep = run_lockstep(experiment_kwargs, args.seed, args.steps, os.path.join(results_dir, "lockstep"))
+        match = compare("sequential vs parallel", sequential, per_instance)
+        match = compare("sequential vs lockstep", sequential, lockstep) and match
+    finally:
+        shutil.rmtree(results_dir)
+
+    if not match:
+        quit(1)
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import simple_plot.rl_plot as rp
 import argparse
 import os
 import math
+import numpy as np
 import matplotlib
 from collections import defaultdict
 
@@ -22,30 +23,70 @@ def find_pairs(agents):
 
     return agent_pairs
 
+def _stream_instances(data_dir, agent):
+    '''
+    Args:
+        data_dir (str)
+        agent (str)
+
+    Returns:
+        (generator): Yields the rewards of each instance (one line of <agent>.csv) as an np.array,
+            reading one line at a time.
+    '''
+    results_file = open(os.path.join(data_dir, agent) + ".csv", "r")
+    for line in results_file:
+        instance = np.fromstring(line.strip().rstrip(","), sep=",")
+        if instance.size > 0:
+            yield instance
+    results_file.close()
+
+def compute_streaming_stats(data_dir, agent, cumulative):
+    '''
+    Args:
+        data_dir (str)
+        agent (str)
+        cumulative (bool)
+
+    Returns:
+        (tuple): (mean, confidence interval) over instances for each episode, as np.arrays.
+
+    Summary:
+        Same as rp.average_data/rp.compute_conf_intervals for one agent, but accumulated
+        online (Welford) so memory doesn't grow with the number of instances.
+    '''
+    count, mean, m2 = 0, None, None
+    for instance in _stream_instances(data_dir, agent):
+        if cumulative:
+            instance = np.cumsum(instance)
+        if mean is None:
+            mean, m2 = np.zeros(len(instance)), np.zeros(len(instance))
+        elif len(instance) != len(mean):
+            raise ValueError("Error: " + agent + " was run with inconsistent parameters (instances of different lengths). Try clearing old data.")
+
+        count += 1
+        delta = instance - mean
+        mean += delta / count
+        m2 += delta * (instance - mean)
+
+    if count == 0:
+        raise ValueError("Error: no data found for " + agent + ".")
+
+    conf_intervals = 1.96 * np.sqrt(m2 / count) / math.sqrt(count)
+
+    return mean, conf_intervals
+
 def compute_pair_diffs_and_cis(agent_pairs, data_dir, cumulative):
     pair_diffs = [[] for alg in agent_pairs]
     
     pair_cis = []
     for i, core_agent_name in enumerate(agent_pairs):
-        pair = agent_pairs[core_agent_name]
-        if data_dir[-1] == "/":
-            data_dir = data_dir[:-1]
-        data = rp.load_data(data_dir, pair) # [alg][instance][episode]
-
-        avg_data = rp.average_data(data, cumulative=cumulative)
-        for e, episode in enumerate(avg_data[0]):
-            # Calculate avg difference between the double and single axes.
-            diff = avg_data[1][e] - avg_data[0][e] # Double is [1], Single [0].
-            pair_diffs[i] += [diff]
-
-        cis = rp.compute_conf_intervals(data, cumulative=cumulative)
-
-        true_pair_cis = []
-        for i in xrange(len(cis[0])):
-            new_ci = math.sqrt( (cis[0][i])**2 + (cis[1][i])**2)
-            true_pair_cis += [new_ci]
-        
-        pair_cis += [true_pair_cis]
+        single_agent, double_agent = agent_pairs[core_agent_name]
+        single_avg, single_cis = compute_streaming_stats(data_dir, single_agent, cumulative=cumulative)
+        double_avg, double_cis = compute_streaming_stats(data_dir, double_agent, cumulative=cumulative)
+
+        # Calculate avg difference between the double and single axes.
+        pair_diffs[i] += list(double_avg - single_avg)
+        pair_cis += [list(np.sqrt(single_cis**2 + double_cis**2))]
 
     return pair_diffs, pair_cis
 
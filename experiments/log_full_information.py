@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+'''
+Writes full-information bandit logs of a solar simulation.
+
+Runs a logging agent on the MDP and, every step, records the context (state
+features), the reward of every bandit arm (SolarOOMDP.reward_all_arms), and
+the arm the agent took with the reward it got. The logs can be used for
+off-policy evaluation and offline training without rerunning the simulator
+per agent:
+
+    python log_full_information.py -loc=nola -percept=image -steps=20000 -out=logs/nola
+
+Layout (chunks written as .npz shards, so long runs stay in bounded memory):
+
+    <out>/arms.npy                      B x 2 (ns, ew) angles of the arms
+    <out>/instance-<i>-<shard>.npz      step (T), context (T x F), arm_rewards (T x B), arm (T), reward (T)
+
+Per row t:
+    arm_rewards[t, b]   Reward of moving to arm b at step t: the energy arm b's orientation makes
+                        during step t, minus the cost of moving there from the current panel.
+    arm[t]              Index of the logging agent's action into arm_rewards and arms.npy
+                        (-1 for incremental and "optimal" actions, which aren't arms).
+    reward[t]           The MDP reward the logging agent got. It credits the energy of the orientation
+                        the panel had during step t, before the move (the previous arm, for a bandit
+                        policy), minus the cost of the move. So reward[t] is arm_rewards[t, arm[t]] only
+                        when the panel was already at arm[t]. In general,
+                            reward[t] = arm_rewards[t, arm[t]] - E_t(arm[t]) + E_t(panel before the move),
+                        E_t being the energy of an orientation during step t. Evaluate bandit policies on
+                        arm_rewards.
+'''
+
+# Python imports.
+import argparse
+import os
+import numpy as np
+
+# Other imports.
+import solar_experiments as se
+
+class _LogWriter(object):
+    ''' Buffers log rows and writes them as .npz shards. '''
+
+    def __init__(self, log_dir, instance, chunk_size):
+        self.log_dir = log_dir
+        self.instance = instance
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.shard = 0
+
+    def add(self, step, context, arm_rewards, arm, reward):
+        self.rows.append((step, context, arm_rewards, arm, reward))
+        if len(self.rows) == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        steps, contexts, arm_rewards, arms, rewards = zip(*self.rows)
+        shard_path = os.path.join(self.log_dir, "instance-" + str(self.instance) + "-" + str(self.shard) + ".npz")
+        np.savez(shard_path, step=np.array(steps), context=np.array(contexts, dtype=np.float32),
+                    arm_rewards=np.array(arm_rewards), arm=np.array(arms), reward=np.array(rewards))
+        self.shard += 1
+        self.rows = []
+
+def log_full_information(solar_mdp, agent, steps, log_dir, instances=1, chunk_size=4096):
+    '''
+    Args:
+        solar_mdp (SolarOOMDP)
+        agent (Agent): The logging policy (its actions drive the panel, and so the contexts).
+        steps (int): Steps per instance.
+        log_dir (str)
+        instances (int)
+        chunk_size (int): Rows per shard.
+
+    Summary:
+        Writes the logs of @instances runs of @agent (see the module docstring for the layout).
+    '''
+    if not os.path.isdir(log_dir):
+        os.makedirs(log_dir)
+    np.save(os.path.join(log_dir, "arms.npy"), solar_mdp.get_action_space().get_bandit_angles())
+
+    action_space = solar_mdp.get_action_space()
+    for instance in xrange(instances):
+        solar_mdp.set_instance(instance)
+        agent.reset()
+        writer = _LogWriter(log_dir, instance, chunk_size)
+
+        state, reward = solar_mdp.get_init_state(), 0
+        for step in xrange(steps):
+            action = agent.act(state, reward)
+            arm_rewards = solar_mdp.reward_all_arms(state)
+            context = np.asarray(state.features(), dtype=np.float32)
+
+            reward, next_state = solar_mdp.execute_agent_action(action)
+            writer.add(step, context, arm_rewards, action_space.get_bandit_index(action), reward)
+            state = next_state
+
+        writer.flush()
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-loc", type = str, default = "nola", nargs = '?', help = "Choose the location for the experiment.")
+    parser.add_argument("-percept", type = str, default = "angles", nargs = '?', help = "One of {angles, image, clear_image, cloudy_angles}.")
+    parser.add_argument("-dual_axis", type = int, default = 1, nargs = '?', help = "If 1 uses dual axis tracker.")
+    parser.add_argument("-panel_step", type = int, default = 20, nargs = '?', help = "Degrees between bandit arms.")
+    parser.add_argument("-time_per_step", type = float, default = 20.0, nargs = '?', help = "Minutes per step.")
+    parser.add_argument("-reflective_index", type = float, default = 0.55, nargs = '?', help = "Albedo of the nearby ground.")
+    parser.add_argument("-agent", type = str, default = "grena-tracker", nargs = '?', help = "Name of the logging agent (see solar_experiments._setup_agents).")
+    parser.add_argument("-steps", type = int, default = 10000, nargs = '?', help = "Steps per instance.")
+    parser.add_argument("-instances", type = int, default = 1, nargs = '?', help = "Number of instances.")
+    parser.add_argument("-seed", type = int, default = None, nargs = '?', help = "Seeds the location draws and the weather.")
+    parser.add_argument("-out", type = str, default = "logs", nargs = '?', help = "Directory the logs are written to.")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+
+    agents, solar_mdp = se.setup_experiment(args.percept, loc=args.loc, dual_axis=bool(args.dual_axis), panel_step=args.panel_step, time_per_step=args.time_per_step,
+                                                reflective_index=args.reflective_index, instances=args.instances, seed=args.seed)
+    agents = dict((str(agent), agent) for agent in agents)
+    if args.agent not in agents:
+        print "Error: unknown agent " + args.agent + ", one of " + str(sorted(agents.keys())) + "."
+        quit()
+
+    log_full_information(solar_mdp, agents[args.agent], args.steps, args.out, instances=args.instances)
+    print "Logs written to " + args.out
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,11 @@
 # Python imports.
 import subprocess
 import random
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import os
+import sys
+import time
 
 # Other imports.
 import solar_experiments
@@ -10,28 +15,136 @@ import solar_experiments
 # Global params.
 percept = "angles"
 dual_axis = False
+num_workers = max(multiprocessing.cpu_count() - 1, 1)
+max_retries = 1
 
-def spawn_subproc(location):
+def make_spec(loc, percept=percept, dual_axis=dual_axis, **params):
 	'''
 	Args:
-		task (str)
+		loc (str)
+		percept (str): One of {angles, image}.
+		dual_axis (bool)
+		params: Any other argument of solar_experiments.py (panel_step, time_per_step, num_days, instances, episodes, reflective_index).
+
+	Returns:
+		(dict): An experiment spec.
+	'''
+	spec = {"loc":loc, "percept":percept, "dual_axis":dual_axis}
+	spec.update(params)
+	return spec
+
+def _get_job_name(spec):
+	return "_".join([key + "-" + str(spec[key]) for key in sorted(spec.keys())])
+
+def _get_cmd(spec, results_dir):
+	'''
+	Args:
+		spec (dict)
+		results_dir (str)
+
+	Returns:
+		(list): The command running @spec.
+	'''
+	cmd = [sys.executable, 'solar_experiments.py', '-results_dir=' + results_dir, '-open_plot=0']
+
+	for key in sorted(spec.keys()):
+		if key == "dual_axis":
+			# argparse reads any non-empty value as True, so only pass the flag when set.
+			if spec[key]:
+				cmd.append('-dual_axis=True')
+		else:
+			cmd.append('-' + key + '=' + str(spec[key]))
+
+	return cmd
+
+def _run_job(job):
+	'''
+	Args:
+		job (tuple): (spec, results_dir, log_path, max_retries)
+
+	Returns:
+		(dict): Summary of the job.
 
 	Summary:
-		Spawns a child subprocess to run the experiment.
+		Runs the experiment in a child process (retrying on failure), writing its output to the log.
 	'''
-	cmd = ['python', 'solar_experiments.py', '-loc=' + str(location), '-percept=' + str(percept)]
+	spec, results_dir, log_path, retries = job
+	cmd = _get_cmd(spec, results_dir)
+	start = time.time()
+	attempts = 0
+
+	log = open(log_path, "w")
+	while True:
+		attempts += 1
+		log.write("# Attempt " + str(attempts) + ": " + " ".join(cmd) + "\n")
+		log.flush()
+		returncode = subprocess.call(cmd, stdout=log, stderr=subprocess.STDOUT)
+		if returncode == 0 or attempts > retries:
+			break
+	log.close()
+
+	return {"job":_get_job_name(spec), "returncode":returncode, "attempts":attempts, "seconds":round(time.time() - start, 2), "log":log_path, "results_dir":results_dir}
+
+def _write_summary(run_dir, summaries):
+	summary_keys = ["job", "returncode", "attempts", "seconds", "log", "results_dir"]
+	out_file = open(os.path.join(run_dir, "summary.csv"), "w")
+	out_file.write(",".join(summary_keys) + "\n")
+	for summary in summaries:
+		out_file.write(",".join([str(summary[key]) for key in summary_keys]) + "\n")
+	out_file.close()
+
+def run_experiments(specs, run_name="run", workers=None, retries=None, results_root="results"):
+	'''
+	Args:
+		specs (list of dict): See make_spec.
+		run_name (str)
+		workers (int): Max number of experiments running at once (defaults to num_workers).
+		retries (int): Times a failed experiment is rerun (defaults to max_retries).
+		results_root (str)
+
+	Returns:
+		(list of dict): Summary of each job.
+
+	Summary:
+		Runs every experiment on a bounded pool of child processes. Results of each
+		experiment go to results_root/run_name/<job>/, its output to results_root/run_name/logs/<job>.log,
+		and the status of every job to results_root/run_name/summary.csv.
+	'''
+	workers = num_workers if workers is None else workers
+	retries = max_retries if retries is None else retries
+	run_dir = os.path.join(results_root, run_name)
+	log_dir = os.path.join(run_dir, "logs")
+	if not os.path.exists(log_dir):
+		os.makedirs(log_dir)
+
+	jobs = []
+	for spec in specs:
+		job_name = _get_job_name(spec)
+		jobs.append((spec, os.path.join(run_dir, job_name), os.path.join(log_dir, job_name + ".log"), retries))
+
+	# Each worker thread just waits on its child process.
+	pool = ThreadPool(min(workers, len(jobs)) or 1)
+	summaries = []
+	try:
+		for summary in pool.imap_unordered(_run_job, jobs):
+			status = "done" if summary["returncode"] == 0 else "FAILED"
+			print "[" + status + "] " + summary["job"] + " (attempts: " + str(summary["attempts"]) + ", " + str(summary["seconds"]) + "s)"
+			summaries.append(summary)
+	finally:
+		pool.close()
+		pool.join()
 
-	if dual_axis:
-		cmd.append('-single_axis=True')
+	_write_summary(run_dir, summaries)
+	num_failed = len([summary for summary in summaries if summary["returncode"] != 0])
+	print str(len(summaries) - num_failed) + "/" + str(len(summaries)) + " experiments succeeded. Summary in " + os.path.join(run_dir, "summary.csv")
 
-	subprocess.Popen(cmd)
+	return summaries
 
 def run_average_usa_locs_exp():
-	spawn_subproc(location="usa_avg")
+	run_experiments([make_spec(loc="usa_avg")], run_name="usa_avg")
 
 def run_iaai_experiments():
-	for loc in ["nola", "alaska", "australia", "japan"]:
-		spawn_subproc(loc)
+	run_experiments([make_spec(loc) for loc in ["nola", "alaska", "australia", "japan"]], run_name="iaai")
 
 def main():
 	run_average_usa_locs_exp()
@@ -0,0 +1,42 @@
+''' CloudFieldClass.py: Contains the CloudField class. '''
+
+# Python imports.
+import numpy as np
+
+# Local imports.
+from CloudClass import Cloud
+
+class CloudField(object):
+    '''
+    The clouds of the sky image, held as arrays (one entry per cloud).
+
+    Positions and radii are in pixels of the (img_dims x img_dims) sky image;
+    dx, dy are pixels moved per hour.
+    '''
+
+    def __init__(self, x=(), y=(), dx=(), dy=(), rx=(), ry=(), intensity=None):
+        self.x, self.y = np.array(x, dtype=float), np.array(y, dtype=float)
+        self.dx, self.dy = np.array(dx, dtype=float), np.array(dy, dtype=float)
+        self.rx, self.ry = np.array(rx, dtype=float), np.array(ry, dtype=float)
+        self.intensity = np.full(len(self.x), Cloud.PIX_INTENSITY) if intensity is None else np.array(intensity, dtype=float)
+
+    def __len__(self):
+        return len(self.x)
+
+    def move(self, timestep):
+        '''
+        Args:
+            timestep (float): Minutes.
+        '''
+        self.x += self.dx * timestep/60.0
+        self.y += self.dy * timestep/60.0
+
+    def get_arrays(self):
+        '''
+        Returns:
+            (tuple): (mu_x, mu_y, sigma_x, sigma_y, intensity), the gaussian of each cloud.
+        '''
+        return self.x, self.y, self.rx, self.ry, self.intensity
+
+    def __str__(self):
+        return "clouds: " + ", ".join(["(x=" + str(x) + " y=" + str(y) + " rx=" + str(rx) + " ry=" + str(ry) + ")" for x, y, rx, ry in zip(self.x, self.y, self.rx, self.ry)])
@@ -0,0 +1,123 @@
+''' CompactSolarOOMDPStateClass.py: Contains the CompactSolarOOMDPState class. '''
+
+# Python imports.
+import numpy as np
+
+class CompactSolarOOMDPState(object):
+    '''
+    Array-backed Solar Panel State.
+
+    Stores the sun angles, panel angles and (in image mode) the image in one
+    contiguous float32 buffer laid out as [sun_AZ, sun_ALT, panel_ew, panel_ns, pixels...],
+    instead of a dict of OOMDPObjects. Exposes the same getters as SolarOOMDPState.
+    '''
+
+    __slots__ = ["date_time", "longitude", "latitude", "data", "feature_offset", "_is_terminal"]
+
+    def __init__(self, date_time, longitude, latitude, sun_angle_AZ, sun_angle_ALT, panel_angle_ew, panel_angle_ns, image=None):
+        '''
+        Args:
+            date_time (datetime)
+            longitude (float)
+            latitude (float)
+            sun_angle_AZ (float)
+            sun_angle_ALT (float)
+            panel_angle_ew (float)
+            panel_angle_ns (float)
+            image (np.array): If given, the features are the panel angles and pixels (the sun angles stay hidden).
+        '''
+        self.date_time = date_time
+        self.longitude = longitude
+        self.latitude = latitude
+        self._is_terminal = False
+
+        num_pixels = 0 if image is None else image.size
+        self.data = np.empty(4 + num_pixels, dtype=np.float32)
+        self.data[:4] = sun_angle_AZ, sun_angle_ALT, panel_angle_ew, panel_angle_ns
+        if image is not None:
+            self.data[4:] = image.ravel()
+        self.feature_offset = 0 if image is None else 2
+
+    # --- State interface (see simple_rl's State) ---
+
+    def features(self):
+        '''
+        Returns:
+            (np.array): A view into the state buffer (no copy).
+        '''
+        return self.data[self.feature_offset:]
+
+    def get_data(self):
+        return self.features()
+
+    def get_num_feats(self):
+        return len(self.data) - self.feature_offset
+
+    def is_terminal(self):
+        return self._is_terminal
+
+    def set_terminal(self, is_term=True):
+        self._is_terminal = is_term
+
+    def __array__(self, dtype=None):
+        return self.features() if dtype is None else self.features().astype(dtype)
+
+    def __getitem__(self, index):
+        return self.features()[index]
+
+    def __len__(self):
+        return self.get_num_feats()
+
+    def __hash__(self):
+        return hash(self.features().tobytes())
+
+    def __eq__(self, other):
+        if isinstance(other, CompactSolarOOMDPState):
+            return np.array_equal(self.features(), other.features())
+        return False
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        return "s." + str(self.features())
+
+    # --- Time and Loc (for trackers) ---
+
+    def get_day_of_year(self):
+        return self.date_time.timetuple().tm_yday
+
+    def get_year(self):
+        return self.date_time.year
+
+    def get_month(self):
+        return self.date_time.month
+
+    def get_day(self):
+        return self.date_time.day
+
+    def get_hour(self):
+        return self.date_time.hour
+
+    def get_longitude(self):
+        return self.longitude
+
+    def get_latitude(self):
+        return self.latitude
+
+    def get_date_time(self):
+        return self.date_time
+
+    # --- State Attributes ---
+
+    def get_sun_angle_AZ(self):
+        return float(self.data[0])
+
+    def get_sun_angle_ALT(self):
+        return float(self.data[1])
+
+    def get_panel_angle_ew(self, panel_index=0):
+        return float(self.data[2])
+
+    def get_panel_angle_ns(self, panel_index=0):
+        return float(self.data[3])
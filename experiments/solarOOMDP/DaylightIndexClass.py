@@ -0,0 +1,108 @@
+''' DaylightIndexClass.py: Contains the DaylightIndex class. '''
+
+# Python imports.
+import bisect
+import numpy as np
+
+class DaylightIndex(object):
+    '''
+    Sunrise/sunset index of one location, built lazily a chunk of days at a time.
+
+    Times are offsets (in seconds) from a fixed start time. Daylight intervals
+    are found by sampling the sun's altitude on a coarse grid and refining each
+    horizon crossing by bisection, keeping the endpoint where the sun is up.
+    '''
+
+    def __init__(self, altitude_func, min_altitude_deg=0.0, search_step_minutes=10, chunk_days=30, max_search_days=400, bisection_steps=12):
+        '''
+        Args:
+            altitude_func (lambda): np.array of offsets (seconds) --> np.array of sun altitudes (degrees).
+            min_altitude_deg (float): The sun counts as up above this altitude.
+            search_step_minutes (float): Spacing of the altitude samples (shorter daylight may be missed).
+            chunk_days (int): Days indexed each time the index grows.
+            max_search_days (int): How far ahead to look for a sunrise before giving up (polar night).
+            bisection_steps (int): Refinement steps per crossing.
+        '''
+        self.altitude_func = altitude_func
+        self.min_altitude_deg = min_altitude_deg
+        self.search_step = search_step_minutes * 60.0
+        self.chunk_seconds = chunk_days * 86400.0
+        self.max_search_seconds = max_search_days * 86400.0
+        self.bisection_steps = bisection_steps
+
+        self.intervals = [] # (sunrise, sunset) offsets, sun up at both ends.
+        self.sunsets = []
+        self.indexed_until = 0.0
+        self._open_sunrise = None
+
+    def get_next_time(self, offset):
+        '''
+        Args:
+            offset (float): Candidate time of the next step.
+
+        Returns:
+            (tuple): (offset, bool): @offset if the sun is up then, otherwise the
+                next sunrise (and True, for having skipped the night).
+        '''
+        interval = self._get_interval(offset)
+        if interval is None or offset >= interval[0]:
+            return offset, False
+        return interval[0], True
+
+    def _get_interval(self, offset):
+        '''
+        Returns:
+            (tuple): The first daylight interval ending at or after @offset (None if none is found in time).
+        '''
+        while True:
+            interval_index = bisect.bisect_left(self.sunsets, offset)
+            if interval_index < len(self.intervals):
+                return self.intervals[interval_index]
+            if self.indexed_until > offset + self.max_search_seconds:
+                return None
+            self._extend()
+
+    def _extend(self):
+        start = self.indexed_until
+        samples = start + np.arange(0, self.chunk_seconds + self.search_step, self.search_step)
+        sun_up = self.altitude_func(samples) > self.min_altitude_deg
+
+        if start == 0.0 and sun_up[0]:
+            self._open_sunrise = 0.0
+
+        # Horizon crossings between consecutive samples.
+        rises = np.nonzero(~sun_up[:-1] & sun_up[1:])[0]
+        sets = np.nonzero(sun_up[:-1] & ~sun_up[1:])[0]
+        sunrises = self._refine(samples[rises], samples[rises + 1])
+        sunsets = self._refine(samples[sets + 1], samples[sets])
+
+        # Pair them up in time order.
+        events = sorted([(t, True) for t in sunrises] + [(t, False) for t in sunsets])
+        for time, is_sunrise in events:
+            if is_sunrise:
+                self._open_sunrise = time
+            elif self._open_sunrise is not None:
+                self.intervals.append((self._open_sunrise, time))
+                self.sunsets.append(time)
+                self._open_sunrise = None
+
+        self.indexed_until = samples[-1]
+
+    def _refine(self, down, up):
+        '''
+        Args:
+            down (np.array): Offsets where the sun is down.
+            up (np.array): Offsets where the sun is up (each paired with @down).
+
+        Returns:
+            (list of float): Offsets within search_step / 2**bisection_steps of each crossing, with the sun up.
+        '''
+        if len(down) == 0:
+            return []
+
+        for _ in xrange(self.bisection_steps):
+            mid = (down + up) / 2.0
+            mid_up = self.altitude_func(mid) > self.min_altitude_deg
+            up, down = np.where(mid_up, mid, up), np.where(mid_up, down, mid)
+
+        return list(up)
@@ -0,0 +1,125 @@
+'''
+IrradianceAtlasClass.py: Contains the IrradianceAtlas class.
+
+On-disk cache of SunEphemeris tables (clock, sun positions and clear-sky
+radiation per step), so runs at the same location, start time and timestep
+load them instead of recomputing them. Each entry is a directory of .npy
+files, read back as memory maps:
+
+    <cache_dir>/<key>/key.json
+    <cache_dir>/<key>/<table>.npy
+'''
+
+# Python imports.
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+class IrradianceAtlas(object):
+    ''' Directory of ephemeris tables with least-recently-used eviction. '''
+
+    # Bump whenever the sun position or radiation model changes, to invalidate old entries.
+    MODEL_VERSION = 1
+
+    def __init__(self, cache_dir, max_entries=64):
+        '''
+        Args:
+            cache_dir (str)
+            max_entries (int): Entries beyond this many are evicted, least recently used first.
+        '''
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+
+    def get_key(self, latitude_deg, longitude_deg, start_time, timestep, reflective_index, skip_night, weather_id=None):
+        '''
+        Args:
+            weather_id (str): See TMYWeather.get_id (None for clear skies).
+
+        Returns:
+            (str): The key of the tables with these parameters.
+        '''
+        key_fields = self._get_key_fields(latitude_deg, longitude_deg, start_time, timestep, reflective_index, skip_night, weather_id)
+        return hashlib.sha1(json.dumps(key_fields, sort_keys=True)).hexdigest()
+
+    def _get_key_fields(self, latitude_deg, longitude_deg, start_time, timestep, reflective_index, skip_night, weather_id=None):
+        key_fields = {"latitude_deg":repr(float(latitude_deg)),
+                "longitude_deg":repr(float(longitude_deg)),
+                "start_time":start_time.isoformat(),
+                "timestep":repr(float(timestep)),
+                "reflective_index":repr(float(reflective_index)),
+                "skip_night":bool(skip_night),
+                "model_version":IrradianceAtlas.MODEL_VERSION}
+        if weather_id is not None:
+            key_fields["weather"] = weather_id
+        return key_fields
+
+    def load(self, key):
+        '''
+        Args:
+            key (str): See get_key.
+
+        Returns:
+            (dict): Table name --> read-only memory-mapped np.array (None if @key isn't cached).
+        '''
+        entry_dir = os.path.join(self.cache_dir, key)
+        key_path = os.path.join(entry_dir, "key.json")
+        if not os.path.isfile(key_path):
+            return None
+
+        try:
+            with open(key_path) as key_file:
+                table_names = json.load(key_file)["tables"]
+            tables = dict((name, np.load(os.path.join(entry_dir, name + ".npy"), mmap_mode="r")) for name in table_names)
+        except (IOError, ValueError, KeyError):
+            # Entry evicted or being replaced by another process.
+            return None
+
+        # Mark as recently used.
+        os.utime(key_path, None)
+
+        return tables
+
+    def save(self, key, tables, key_fields=None):
+        '''
+        Args:
+            key (str): See get_key.
+            tables (dict): Table name --> np.array.
+            key_fields (dict): Written next to the tables, for inspection.
+
+        Summary:
+            Writes the entry to a temporary directory and renames it into place, so
+            concurrent readers (e.g. parallel workers) never see a partial entry.
+        '''
+        entry_dir = os.path.join(self.cache_dir, key)
+        temp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp-")
+
+        for name, table in tables.items():
+            np.save(os.path.join(temp_dir, name + ".npy"), np.asarray(table))
+        with open(os.path.join(temp_dir, "key.json"), "w") as key_file:
+            json.dump({"key":key_fields, "tables":sorted(tables.keys())}, key_file, sort_keys=True)
+
+        # Replace any older (shorter) entry.
+        if os.path.isdir(entry_dir):
+            shutil.rmtree(entry_dir, ignore_errors=True)
+        try:
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another process saved the same entry first.
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for key in os.listdir(self.cache_dir):
+            key_path = os.path.join(self.cache_dir, key, "key.json")
+            if not key.startswith(".") and os.path.isfile(key_path):
+                entries.append((os.path.getmtime(key_path), key))
+
+        for _, key in sorted(entries)[:max(len(entries) - self.max_entries, 0)]:
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
@@ -3,6 +3,7 @@
 import numpy as np
 
 g = 9.8 #meters per second
+energy_table_step = np.radians(0.1) #resolution of the actuator energy tables (radians)
 
 class Panel():
     def __init__(self,
@@ -45,6 +46,11 @@ class Panel():
         self.actuator_attrib['ew'] = {'offset': actuator_offset_ew, 'mount':actuator_mount_ew}
         self.actuator_attrib['ns'] = {'offset': actuator_offset_ns, 'mount': actuator_mount_ns}
 
+        #cumulative rotation energy of each axis, from -90 degrees to each angle of the table
+        self.energy_tables = {}
+        for axis in self.actuator_attrib:
+            self.energy_tables[axis] = self.__get_energy_table__(axis)
+
 
     def get_power(self, flux):
         '''
@@ -139,8 +145,47 @@ class Panel():
 
         return work
 
+    def __get_energy_table__(self, axis):
+        '''
+        Integrates the rotation energy of an axis over [-pi/2, pi/2] (midpoint rule).
+        The load is singular where the actuator lines up with the mount arm, so the
+        energy of moves across that angle is bounded by the table resolution.
+        :param axis: axis indicator (ew or ns)
+        :return: cumulative energy (Joules) at angles -pi/2, -pi/2 + energy_table_step, ..., pi/2
+        '''
+        num_cells = int(round(np.pi / energy_table_step))
+        midpoints = -np.pi / 2 + (np.arange(num_cells) + 0.5) * energy_table_step
+
+        cell_work = self.get_rotation_energy_for_axis(axis, midpoints, energy_table_step)
+
+        return np.concatenate([[0.], np.cumsum(cell_work)])
 
+    def __get_cumulative_energy__(self, axis, angle):
+        '''
+        Linear interpolation in the energy table of an axis.
+        :param angle: panel angle(s) for this axis (radians)
+        :return: energy (Joules) to rotate from -pi/2 to @angle
+        '''
+        table = self.energy_tables[axis]
 
+        if isinstance(angle, (int, float)):
+            #scalar fast path (one move per step in SolarOOMDP)
+            position = (max(min(angle, np.pi / 2), -np.pi / 2) + np.pi / 2) / energy_table_step
+            index = min(int(position), len(table) - 2)
+        else:
+            position = (np.clip(angle, -np.pi / 2, np.pi / 2) + np.pi / 2) / energy_table_step
+            index = np.minimum(np.floor(position).astype(int), len(table) - 2)
 
+        return table[index] + (position - index) * (table[index + 1] - table[index])
 
+    def get_move_energy_for_axis(self, axis, start_angle, end_angle, actuator_efficiency=1.):
+        '''
+        Energy of an arbitrary move (any size, either direction), looked up in the precomputed tables.
+        :param axis: axis indicator (ew or ns)
+        :param start_angle: angle(s) of the panel before the move (radians)
+        :param end_angle: angle(s) of the panel after the move (radians)
+        :return: energy consumed during rotation operation (Joules)
+        '''
+        work = abs(self.__get_cumulative_energy__(axis, end_angle) - self.__get_cumulative_energy__(axis, start_angle))
 
+        return work/actuator_efficiency
@@ -0,0 +1,53 @@
+''' PhaseProfilerClass.py: Contains the PhaseProfiler class. '''
+
+# Python imports.
+import time
+from collections import defaultdict
+
+class PhaseProfiler(object):
+    '''
+    Accumulates call counts and wall time per simulator phase.
+
+    Usage (chaining consecutive phases):
+        start = time.time()
+        ...
+        start = profiler.add("phase_a", start)
+        ...
+        start = profiler.add("phase_b", start)
+    '''
+
+    def __init__(self, name="profile"):
+        self.name = name
+        self.reset()
+
+    def reset(self):
+        self.counts = defaultdict(int)
+        self.seconds = defaultdict(float)
+
+    def add(self, phase, start):
+        '''
+        Args:
+            phase (str)
+            start (float): time.time() when the phase started.
+
+        Returns:
+            (float): The current time (the start of the next phase).
+        '''
+        now = time.time()
+        self.counts[phase] += 1
+        self.seconds[phase] += now - start
+        return now
+
+    def get_summary(self):
+        '''
+        Returns:
+            (list of tuple): (phase, calls, total seconds, mean microseconds per call), slowest phase first.
+        '''
+        summary = [(phase, self.counts[phase], self.seconds[phase], 1e6 * self.seconds[phase] / self.counts[phase]) for phase in self.counts]
+        return sorted(summary, key=lambda row: -row[2])
+
+    def __str__(self):
+        lines = ["--- " + self.name + " ---"]
+        for phase, calls, seconds, mean_us in self.get_summary():
+            lines.append("\t" + phase.ljust(22) + str(calls).rjust(9) + " calls " + ("%.3f" % seconds).rjust(10) + "s " + ("%.1f" % mean_us).rjust(10) + "us/call")
+        return "\n".join(lines)
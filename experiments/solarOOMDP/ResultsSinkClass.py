@@ -0,0 +1,107 @@
+'''
+ResultsSinkClass.py: Contains the ResultsSink class.
+
+Buffers per-step results (reward and energy breakdown) in memory and writes
+them in chunks as .npz shards, one set of shards per agent and instance:
+
+    <results_dir>/<agent>/instance-<i>-<shard>.npz
+'''
+
+# Python imports.
+import os
+import glob
+import numpy as np
+
+class ResultsSink(object):
+    ''' Buffered, columnar writer for per-step results. '''
+
+    COLUMNS = ["step", "reward", "direct", "diffuse", "reflective", "cost"]
+
+    def __init__(self, results_dir, agent_names=None, instances=1, chunk_size=8192, columns=None):
+        '''
+        Args:
+            results_dir (str)
+            agent_names (list of str): If given, the sink moves on to the next agent after
+                @instances calls to end_of_instance (the order of run_agents_on_mdp).
+            instances (int)
+            chunk_size (int): Number of rows buffered before a shard is written.
+            columns (list of str)
+        '''
+        self.results_dir = results_dir
+        self.agent_names = agent_names
+        self.instances = instances
+        self.chunk_size = chunk_size
+        self.columns = ResultsSink.COLUMNS if columns is None else columns
+        self.buffer = np.zeros((len(self.columns), chunk_size))
+        self.num_rows = 0
+        self.shard = 0
+        self.agent_name = None if agent_names is None else agent_names[0]
+        self.instance = 0
+
+    def begin(self, agent_name, instance):
+        '''
+        Summary:
+            Routes the next rows to (@agent_name, @instance).
+        '''
+        self.flush()
+        self.agent_name, self.instance, self.shard = agent_name, instance, 0
+
+    def add(self, **datum):
+        '''
+        Args:
+            datum: One value per column (missing columns are stored as NaN).
+        '''
+        self.buffer[:, self.num_rows] = [datum.get(column, np.nan) for column in self.columns]
+        self.num_rows += 1
+        if self.num_rows == self.chunk_size:
+            self.flush()
+
+    def end_of_instance(self):
+        self.flush()
+        next_instance = self.instance + 1
+        if self.agent_names is not None and next_instance == self.instances:
+            next_agent = min(self.agent_names.index(self.agent_name) + 1, len(self.agent_names) - 1)
+            self.begin(self.agent_names[next_agent], 0)
+        else:
+            self.begin(self.agent_name, next_instance)
+
+    def flush(self):
+        if self.num_rows == 0:
+            return
+
+        agent_dir = os.path.join(self.results_dir, str(self.agent_name))
+        if not os.path.isdir(agent_dir):
+            os.makedirs(agent_dir)
+
+        shard_path = os.path.join(agent_dir, "instance-" + str(self.instance) + "-" + str(self.shard) + ".npz")
+        np.savez(shard_path, **dict(zip(self.columns, self.buffer[:, :self.num_rows])))
+        self.shard += 1
+        self.num_rows = 0
+
+    def close(self):
+        self.flush()
+
+def load_results(results_dir, agent_name):
+    '''
+    Args:
+        results_dir (str)
+        agent_name (str)
+
+    Returns:
+        (list of dict): For each instance, a dict mapping each column to an np.array (one entry per step).
+    '''
+    shards = {}
+    for shard_path in glob.glob(os.path.join(results_dir, agent_name, "instance-*-*.npz")):
+        instance, shard = [int(x) for x in os.path.basename(shard_path)[len("instance-"):-len(".npz")].split("-")]
+        shards.setdefault(instance, []).append((shard, shard_path))
+
+    results = []
+    for instance in sorted(shards.keys()):
+        columns = {}
+        for _, shard_path in sorted(shards[instance]):
+            with np.load(shard_path) as shard:
+                for column in shard.files:
+                    columns.setdefault(column, []).append(shard[column])
+        results.append(dict((column, np.concatenate(values)) for column, values in columns.items()))
+
+    return results
@@ -0,0 +1,164 @@
+''' SolarActionSpaceClass.py: Contains the SolarActionSpace class. '''
+
+# Python imports.
+import itertools
+import numpy as np
+
+class SolarActionSpace(object):
+    '''
+    Indexed action set of a SolarOOMDP, built once per MDP.
+
+    Every action has an integer id: the incremental actions come first, then
+    "optimal", then one id per bandit (ns, ew) orientation. Actions may be
+    given either as their string or as their id.
+    '''
+
+    OPTIMAL_ACTION = "optimal"
+
+    # (ns_step, ew_step) direction of each incremental action, in units of panel_step.
+    ACTION_DIRECTIONS = {"panel_forward_ns": (1, 0),
+                         "panel_back_ns": (-1, 0),
+                         "do_nothing": (0, 0),
+                         "panel_forward_ew": (0, 1),
+                         "panel_back_ew": (0, -1)}
+
+    def __init__(self, incremental_actions, panel_step, dual_axis=True):
+        '''
+        Args:
+            incremental_actions (list of str): e.g. SolarOOMDP.ACTIONS.
+            panel_step (float): Spacing (degrees) of the bandit orientation grid.
+            dual_axis (bool): If false the bandit grid only varies the ns angle.
+        '''
+        if not panel_step > 0:
+            raise ValueError("Error: panel_step must be a positive number of degrees (got " + str(panel_step) + ").")
+
+        ns = SolarActionSpace._get_grid_angles(panel_step)
+        ew = SolarActionSpace._get_grid_angles(panel_step) if dual_axis else [0]
+
+        self.incremental_actions = list(incremental_actions)
+        self.bandit_angle_pairs = list(itertools.product(ns, ew))
+        self.bandit_actions = [SolarActionSpace._format_angle(ns_deg) + "," + SolarActionSpace._format_angle(ew_deg) for ns_deg, ew_deg in self.bandit_angle_pairs]
+        self.actions = self.incremental_actions + [SolarActionSpace.OPTIMAL_ACTION] + self.bandit_actions
+
+        self.action_ids = dict((action, i) for i, action in enumerate(self.actions))
+        self.bandit_offset = len(self.incremental_actions) + 1
+
+        # Orientations of the bandit arms, B x 2 rows of (ns, ew).
+        self.bandit_angles = np.array(self.bandit_angle_pairs, dtype=float).reshape(-1, 2)
+
+        # Directions of the incremental actions, I x 2 rows of (ns_step, ew_step).
+        self.incremental_directions = np.array([SolarActionSpace.ACTION_DIRECTIONS[a] for a in self.incremental_actions]).reshape(-1, 2)
+
+    @staticmethod
+    def _get_grid_angles(panel_step):
+        '''
+        Returns:
+            (list): The angles from -90 to 90 (included, if on the grid) every @panel_step degrees,
+                as ints when the step is a whole number of degrees.
+        '''
+        if float(panel_step).is_integer():
+            return range(-90, 91, int(panel_step))
+        return [round(angle, 6) for angle in np.arange(-90, 90 + 1e-9, panel_step)]
+
+    @staticmethod
+    def _format_angle(angle_deg):
+        # Whole degrees print as ints ("-90"), so the action names don't depend on the type of panel_step.
+        return str(int(angle_deg)) if float(angle_deg).is_integer() else repr(angle_deg)
+
+    def __len__(self):
+        return len(self.actions)
+
+    def get_actions(self):
+        return self.actions
+
+    def get_bandit_actions(self):
+        return self.bandit_actions
+
+    def get_bandit_angles(self):
+        '''
+        Returns:
+            (np.array): B x 2 array of (ns, ew) angles, aligned with get_bandit_actions().
+        '''
+        return self.bandit_angles
+
+    def is_valid(self, action):
+        if isinstance(action, (int, long, np.integer)):
+            return 0 <= action < len(self.actions)
+        return action in self.action_ids
+
+    def get_action_id(self, action):
+        '''
+        Args:
+            action (str or int)
+
+        Returns:
+            (int)
+        '''
+        if isinstance(action, (int, long, np.integer)):
+            return action
+        return self.action_ids[action]
+
+    def get_action(self, action):
+        '''
+        Args:
+            action (str or int)
+
+        Returns:
+            (str)
+        '''
+        if isinstance(action, (int, long, np.integer)):
+            return self.actions[action]
+        return action
+
+    def is_bandit_action(self, action):
+        return self.get_action_id(action) >= self.bandit_offset
+
+    def get_bandit_index(self, action):
+        '''
+        Args:
+            action (str or int)
+
+        Returns:
+            (int): The index of @action in get_bandit_actions()/get_bandit_angles() (-1 if it isn't a bandit action).
+        '''
+        action_id = self.get_action_id(action)
+        return action_id - self.bandit_offset if action_id >= self.bandit_offset else -1
+
+    def get_bandit_angle_pair(self, action):
+        '''
+        Args:
+            action (str or int): A bandit action.
+
+        Returns:
+            (tuple): (ns, ew) angles in degrees.
+        '''
+        return self.bandit_angle_pairs[self.get_action_id(action) - self.bandit_offset]
+
+    def get_target_angles(self, action_ids, panel_angles_ns, panel_angles_ew, panel_step):
+        '''
+        Args:
+            action_ids (np.array): N action ids (incremental or bandit moves).
+            panel_angles_ns (np.array): N current ns angles (degrees).
+            panel_angles_ew (np.array): N current ew angles (degrees).
+            panel_step (int): Degrees moved by an incremental action.
+
+        Returns:
+            (tuple): (np.array of N target ns angles, np.array of N target ew angles), unclipped.
+
+        Summary:
+            Decodes the moves of vectorized simulators, which have no "optimal" move
+            (it needs the sun at each panel's step), so its id raises a ValueError.
+        '''
+        action_ids = np.asarray(action_ids)
+        if np.any((action_ids < 0) | (action_ids >= len(self.actions))):
+            raise ValueError("Error: action ids must be in [0, " + str(len(self.actions)) + ").")
+        if np.any(action_ids == self.bandit_offset - 1):
+            raise ValueError("Error: the " + SolarActionSpace.OPTIMAL_ACTION + " action (id " + str(self.bandit_offset - 1) + ") is not supported here.")
+
+        bandit = action_ids >= self.bandit_offset
+        directions = self.incremental_directions[np.where(bandit, 0, action_ids)]
+        targets = self.bandit_angles[np.where(bandit, action_ids - self.bandit_offset, 0)]
+        new_ns = np.where(bandit, targets[:, 0], panel_angles_ns + directions[:, 0] * panel_step)
+        new_ew = np.where(bandit, targets[:, 1], panel_angles_ew + directions[:, 1] * panel_step)
+
+        return new_ns, new_ew
@@ -9,15 +9,19 @@ import math as m
 import numpy as np
 import datetime
 import random
+import time
 import matplotlib.pyplot as plt
 import scipy.integrate as integrate
-import itertools
 
 # simple_rl imports.
 from simple_rl.mdp.oomdp.OOMDPClass import OOMDP
 from simple_rl.mdp.oomdp.OOMDPObjectClass import OOMDPObject
 from SolarOOMDPStateClass import SolarOOMDPState
-from CloudClass import Cloud
+from CompactSolarOOMDPStateClass import CompactSolarOOMDPState
+from WeatherTraceClass import WeatherTrace
+from SunEphemerisClass import SunEphemeris
+from SolarActionSpaceClass import SolarActionSpace
+from PhaseProfilerClass import PhaseProfiler
 import solar_helpers as sh
 
 class SolarOOMDP(OOMDP):
@@ -33,27 +37,28 @@ class SolarOOMDP(OOMDP):
                 date_time,
                 name_ext,
                 timestep=30,
-                panel_step=.1,
+                panel_step=1,
                 reflective_index=0.65,
                 latitude_deg=40.7,
                 longitude_deg=142.17,
                 img_dims=16,
-                mode_dict = {'dual_axis':True, 'image_mode':False, 'cloud_mode':False}):
+                optimal_grid_step=5,
+                mode_dict = {'dual_axis':True, 'image_mode':False, 'cloud_mode':False},
+                seed=None,
+                instances=1,
+                weather=None,
+                atlas=None):
 
         if name_ext == "usa_avg":
             self.loc_index = 0
             self.lat_list, self.lon_list = latitude_deg, longitude_deg
-            latitude_deg, longitude_deg = latitude_deg[0], longitude_deg[1]
+            latitude_deg, longitude_deg = latitude_deg[0], longitude_deg[0]
 
             # Error check the lat/long.
         elif abs(latitude_deg) > 90 or abs(longitude_deg) > 180:
             print "Error: latitude must be between [-90, 90], longitude between [-180,180]. Lat:", latitude_deg, "Long:", longitude_deg
             quit()
 
-        if mode_dict['cloud_mode'] and not mode_dict['image_mode']:
-            print "Warning (SolarOOMDP): Clouds were set to active but image mode is off. No cloud simulation supported for non-image-mode."
-            mode_dict['cloud_mode'] = False
-
         # Mode information
         if not(mode_dict['dual_axis']):
             # If we are in 1-axis tracking mode, change actions accordingly.
@@ -66,7 +71,19 @@ class SolarOOMDP(OOMDP):
         self.img_dims = img_dims
         self.image_mode = mode_dict['image_mode']
         self.cloud_mode = mode_dict['cloud_mode']
-        self.clouds = self._generate_clouds() if mode_dict['cloud_mode'] else []
+        self.compact_state = mode_dict.get('compact_state', False)
+        self.skip_night = mode_dict.get('skip_night', False)
+
+        # Weather, drawn per instance (so each agent sees the same clouds on instance i).
+        self.num_instances = instances
+        self.instance = 0
+        self.weather_seed = random.Random().random() if seed is None else seed
+        self.weather_traces = {}
+
+        # Sky frames of the current instance (steps x img_dims x img_dims), rendered on the first pass
+        # over it and replayed by step index afterwards (see _get_sky_frame).
+        self._clear_sky_frames()
+        self._step_environment = None
 
         #get panel information.
         self.panel = panel
@@ -79,30 +96,52 @@ class SolarOOMDP(OOMDP):
         self.timestep = timestep #timestep in minutes
         self.reflective_index = reflective_index
         self.name_ext = name_ext
+        self.optimal_grid_step = optimal_grid_step
+        self._optimal_grid = None
+        self._bandit_grid = None
+        self.results_sink = None
+        self.weather = weather
+        self.atlas = atlas
+        self.profiler = PhaseProfiler(name="SolarOOMDP profile") if mode_dict.get('profile', False) else None
+        self.action_space = SolarActionSpace(SolarOOMDP.ACTIONS, self.panel_step, self.dual_axis)
 
         # Time stuff.
         self.init_time = date_time
         self.time = date_time
+        self.step_index = 0
+        self.ephemeris = None
 
         # Make state and call super.
-        panels = self._get_default_panel_obj_list()
-        init_state = self._create_state(panels, self.init_time)
-        OOMDP.__init__(self, SolarOOMDP.ACTIONS, self._transition_func, self._reward_func, init_state=init_state)
+        self._setup_instance(0)
+        OOMDP.__init__(self, SolarOOMDP.ACTIONS, self._transition_func, self._reward_func, init_state=self.init_state)
 
     def get_bandit_actions(self):
-        ns = [str(x) for x in xrange(-90, 91, self.panel_step)]
-        if self.dual_axis:
-            ew = [str(x) for x in xrange(-90, 91, self.panel_step)]
-        else:
-            ew = [str(0)]
+        return self.action_space.get_bandit_actions()
+
+    def get_action_space(self):
+        return self.action_space
+
+    def enable_profiling(self, enabled=True):
+        '''
+        Args:
+            enabled (bool): If true, call counts and wall time of each phase of the
+                reward/transition functions are accumulated (and printed at the end of each instance).
+        '''
+        self.profiler = PhaseProfiler(name="SolarOOMDP profile") if enabled else None
 
-        actions = []
+    def get_profiler(self):
+        return self.profiler
 
-        for element in itertools.product(ns, ew):
-            new_action = str(element[0] + "," + element[1])
-            actions.append(new_action)
+    def print_profile(self):
+        if self.profiler is not None:
+            print self.profiler
 
-        return actions
+    def set_results_sink(self, results_sink):
+        '''
+        Args:
+            results_sink (ResultsSink): If set, the reward and its energy breakdown are logged every step.
+        '''
+        self.results_sink = results_sink
 
     def reset(self):
         '''
@@ -110,13 +149,74 @@ class SolarOOMDP(OOMDP):
             Resets the OOMDP back to the initial configuration.
         '''
         self.time = self.init_time
+        self.step_index = 0
+        self.ephemeris.save_to_atlas()
         OOMDP.reset(self)
 
     def end_of_instance(self):
+        if self.results_sink is not None:
+            self.results_sink.end_of_instance()
+
+        if self.profiler is not None:
+            self.print_profile()
+            self.profiler.reset()
+
+        self._setup_instance(self.instance + 1)
+        self.reset()
+
+    def set_instance(self, instance, seed=None):
+        '''
+        Args:
+            instance (int): Index of the instance (from 0).
+            seed (hashable): If given, reseeds the weather.
+
+        Summary:
+            Puts the MDP in the configuration @instance starts from, independent of
+            which instances ran before it (so instances can run in any order or process).
+        '''
+        if seed is not None:
+            self.weather_seed = seed
+            self.weather_traces = {}
+            self._clear_sky_frames()
+
+        self._setup_instance(instance)
+        self.reset()
+
+    def _setup_instance(self, instance):
+        '''
+        Args:
+            instance (int): Index of the instance (from 0).
+
+        Summary:
+            Puts the MDP at the start of @instance: its location (for usa_avg), ephemeris,
+            clock and initial state. The constructor, set_instance and end_of_instance all
+            go through here, so sequential and parallel runs see the same instances.
+        '''
+        self.instance = instance % self.num_instances
         if self.name_ext == "usa_avg":
-            self.loc_index = (self.loc_index + 1) % len(self.lat_list)
+            self.loc_index = instance % len(self.lat_list)
             self.latitude_deg, self.longitude_deg = self.lat_list[self.loc_index], self.lon_list[self.loc_index]
 
+        if self.ephemeris is None or (self.ephemeris.latitude_deg, self.ephemeris.longitude_deg) != (self.latitude_deg, self.longitude_deg):
+            self.ephemeris = self._make_ephemeris()
+            self._clear_sky_frames()
+        self._step_environment = None
+
+        self.time = self.init_time
+        self.step_index = 0
+        self.init_state = self._create_init_state()
+
+    def _make_ephemeris(self):
+        return SunEphemeris(self.latitude_deg, self.longitude_deg, self.init_time, self.timestep, skip_night=self.skip_night,
+                                reflective_index=self.reflective_index, weather=self.weather, atlas=self.atlas)
+
+    def _create_init_state(self):
+        if self.compact_state:
+            return self._create_compact_state(0.0, 0.0, self.step_index)
+
+        panels = self._get_default_panel_obj_list()
+        return self._create_state(panels, self.step_index)
+
     def _get_default_panel_obj_list(self):
         panels = []
         for i in xrange(self.sqrt_num_panels**2):
@@ -147,56 +247,80 @@ class SolarOOMDP(OOMDP):
     # --- CLOUD STUFF ---
     # -------------------
 
-    def _generate_clouds(self):
+    def _get_weather(self):
         '''
         Returns:
-            (list of Cloud)
+            (WeatherTrace): The clouds of the current instance, drawn on first use and then
+                replayed by every agent and episode run on the instance.
         '''
-        num_clouds = random.randint(0,4)
-        clouds = []
-
-        # Generate info for each cloud.
-        dx, dy = 1, 0
-        for i in xrange(num_clouds):
-            x = random.randint(0, self.img_dims)
-            y = random.randint(0, self.img_dims)
-            rx = random.randint(3,6)
-            ry = random.randint(2,rx)
-            clouds.append(Cloud(x, y, dx, dy, rx, ry))
+        if self.instance not in self.weather_traces:
+            self.weather_traces[self.instance] = WeatherTrace(hash((self.weather_seed, self.instance)), self.ephemeris, self.img_dims)
+        return self.weather_traces[self.instance]
 
-        return clouds
-
-    def _move_clouds(self):
+    def _get_cloud_transmittance(self):
         '''
-        Summary:
-            Moves each cloud in the cloud list (self.clouds).
+        Returns:
+            (float): Fraction of the direct radiation let through by the clouds, around
+                the sun as drawn in the sky image of the current step (measured irradiance,
+                from a weather file, already accounts for the clouds).
         '''
-        for cloud in self.clouds:
-            cloud.move(self.timestep)
+        if not self.cloud_mode or self.weather is not None:
+            return 1.0
+
+        return self._get_weather().get_transmittance(self.step_index)
 
     # ----------------------------------
     # --- REWARD AND TRANSITION FUNC ---
     # ----------------------------------
 
+    def execute_agent_actions(self, states, actions):
+        '''
+        Args:
+            states (list of State): The state of each agent, all at the current step.
+            actions (list): The action of each agent.
+
+        Returns:
+            (tuple): (list of float, list of State): the reward and next state of each agent.
+
+        Summary:
+            Advances several agents (each with its own panel) one step on the shared clock and weather.
+            The sun, radiation, clouds and sky frame of the step are table lookups shared by all agents,
+            so only the panel-dependent part of the reward and transition is computed per agent.
+        '''
+        step_index = self.step_index
+        rewards, next_states = [], []
+        for state, action in zip(states, actions):
+            self.step_index = step_index
+            rewards.append(self._reward_func(state, action))
+            next_states.append(self._transition_func(state, action))
+
+        return rewards, next_states
+
     def _reward_func(self, state, action):
         '''
         Args:
             state (OOMDP State)
-            action (str)
+            action (str or int): An action or its id in self.action_space.
 
         Returns
             (float)
         '''
+        profiler = self.profiler
+        if profiler:
+            start = reward_start = time.time()
+
+        action = self.action_space.get_action(action)
 
         # Both altitude_deg and azimuth_deg are in degrees.
-        sun_altitude_deg = sh._compute_sun_altitude(self.latitude_deg, self.longitude_deg, self.get_local_time())
-        sun_azimuth_deg = sh._compute_sun_azimuth(self.latitude_deg, self.longitude_deg, self.get_local_time())
+        sun_altitude_deg, sun_azimuth_deg, sun_vector, radiation = self._get_step_environment()
+        if profiler:
+            start = time.time()
 
         # Panel stuff
         panel_ew_deg = state.get_panel_angle_ew()
         panel_ns_deg = state.get_panel_angle_ns()
 
-        if action is "optimal":
+        if action == "optimal":
             # Compute optimal reward.
             flux = self._compute_optimal_reward(sun_altitude_deg, sun_azimuth_deg)
             # Compute electrical power output of panel for given flux.
@@ -204,15 +328,20 @@ class SolarOOMDP(OOMDP):
 
             # Convert timestep to seconds.
             reward = power * self.timestep * 60 # Joules
+            if profiler:
+                start = profiler.add("optimal_reward", start)
+
+            if self.results_sink is not None:
+                self.results_sink.add(step=self.step_index, reward=reward / 1000000.0)
 
         else:
-            if "energy" in self.name_ext:
-                flux, r_d, r_f, r_r = self._compute_flux(sun_altitude_deg, sun_azimuth_deg, panel_ns_deg, panel_ew_deg, breakdown=True)
+            if "energy" in self.name_ext or self.results_sink is not None:
+                flux, r_d, r_f, r_r = self._compute_flux(sun_vector, radiation, panel_ns_deg, panel_ew_deg, breakdown=True)
             
                 p_d, p_f, p_r = self.panel.get_power(r_d), self.panel.get_power(r_f), self.panel.get_power(r_r)
                 e_d, e_f, e_r = p_d * self.timestep * 60, p_f * self.timestep * 60, p_r * self.timestep * 60
             else:
-                flux = self._compute_flux(sun_altitude_deg, sun_azimuth_deg, panel_ns_deg, panel_ew_deg)
+                flux = self._compute_flux(sun_vector, radiation, panel_ns_deg, panel_ew_deg)
 
             # Compute electrical power output of panel for given flux.
             power = self.panel.get_power(flux)
@@ -221,19 +350,26 @@ class SolarOOMDP(OOMDP):
             energy = power * self.timestep * 60 # Joules
             cost = 0 # in Joules
 
-            # Get cost of motion.
-            if "ew" in action:
-                cost = self.panel.get_rotation_energy_for_axis('ew', np.radians(panel_ew_deg), np.radians(self.panel_step))
-            elif "ns" in action:
-                cost = self.panel.get_rotation_energy_for_axis('ns', np.radians(panel_ns_deg), np.radians(self.panel_step))
+            if profiler:
+                start = time.time()
+
+            # Get cost of motion (incremental or bandit), unless the panel stays put overnight.
+            if action != "do_nothing" and not self.ephemeris.is_night_jump(self.step_index):
+                new_panel_ew_deg, new_panel_ns_deg = self._compute_moved_panel_angles(state, action)
+                cost = self.panel.get_move_energy_for_axis('ew', m.radians(panel_ew_deg), m.radians(new_panel_ew_deg)) + \
+                        self.panel.get_move_energy_for_axis('ns', m.radians(panel_ns_deg), m.radians(new_panel_ns_deg))
 
             reward = energy - cost
+            if profiler:
+                start = profiler.add("actuator_cost", start)
 
-            # sh._write_datum_to_file(str(self), agent, r_d, "direct")
-            # sh._write_datum_to_file(str(self), agent, r_f, "diffuse")
-            # sh._write_datum_to_file(str(self), agent, r_r, "reflective")
+            if self.results_sink is not None:
+                self.results_sink.add(step=self.step_index, reward=reward / 1000000.0, cost=cost / 1000000.0,
+                                        direct=e_d / 1000000.0, diffuse=e_f / 1000000.0, reflective=e_r / 1000000.0)
 
         reward = (reward) / 1000000.0 # Convert Watts to Megawatts
+        if profiler:
+            profiler.add("reward_func", reward_start)
 
         # if "energy" in self.name_ext:
         #     e_d, e_f, e_r = e_d / 1000000.0, e_f / 1000000.0, e_r / 1000000.0
@@ -242,23 +378,23 @@ class SolarOOMDP(OOMDP):
         return reward
 
 
-    def _compute_flux(self, sun_altitude_deg, sun_azimuth_deg, panel_ns_deg, panel_ew_deg, breakdown=False):        
+    def _compute_flux(self, sun_vector, radiation, panel_ns_deg, panel_ew_deg, breakdown=False):        
         '''
         Args:
-            sun_altitude_deg (float)
-            sun_azimuth_deg (float)
+            sun_vector (np.array): See solar_helpers._compute_sun_vector.
+            radiation (tuple): (direct, diffuse, reflective), see _compute_radiation.
             panel_ns_deg (float)
             panel_ew_deg (float)
             breakdown (bool): If true returns breakdown of energy
         '''
-        # Compute direct radiation.
-        direct_rads = sh._compute_radiation_direct(self.get_local_time(), sun_altitude_deg)
-        diffuse_rads = sh._compute_radiation_diffuse(self.get_local_time(), self._get_day(), sun_altitude_deg)
-        reflective_rads = sh._compute_radiation_reflective(self.get_local_time(), self._get_day(), self.reflective_index, sun_altitude_deg)
+        profiler = self.profiler
+        if profiler:
+            start = time.time()
+
+        direct_rads, diffuse_rads, reflective_rads = radiation
 
         # Compute tilted component.
-        direct_tilt_factor = sh._compute_direct_radiation_tilt_factor(panel_ns_deg, panel_ew_deg, sun_altitude_deg, sun_azimuth_deg)
-        fixed_direct_tilt_factor = sh._compute_direct_radiation_tilt_factor(0, 0, sun_altitude_deg, sun_azimuth_deg)
+        direct_tilt_factor = max(np.dot(sun_vector, sh._compute_panel_normal_vector(panel_ns_deg, panel_ew_deg)), 0)
 
         diffuse_tilt_factor = sh._compute_diffuse_radiation_tilt_factor(panel_ns_deg, panel_ew_deg)
         reflective_tilt_factor = sh._compute_reflective_radiation_tilt_factor(panel_ns_deg, panel_ew_deg)
@@ -271,32 +407,80 @@ class SolarOOMDP(OOMDP):
         r_d = direct_rads * direct_tilt_factor
         r_f = diffuse_rads * diffuse_tilt_factor
         r_r = reflective_rads * reflective_tilt_factor
+        if profiler:
+            profiler.add("tilt_factors", start)
 
         if breakdown:
             return flux, r_d, r_f, r_r
 
         return flux
 
+    def _get_step_environment(self):
+        '''
+        Returns:
+            (tuple): (sun altitude, sun azimuth, sun vector, radiation) of the reward at the current step
+                (see _compute_radiation). Computed once per step and shared by every panel evaluated at it,
+                e.g. the agents of execute_agent_actions, so the "sun_position" and "radiation" profiling
+                phases count the steps computed rather than the reward calls.
+        '''
+        key = (self.step_index, self.instance)
+        if self._step_environment is None or self._step_environment[0] != key:
+            profiler = self.profiler
+            if profiler:
+                start = time.time()
+
+            sun_altitude_deg, sun_azimuth_deg = self.ephemeris.get_local_sun_angles(self.step_index)
+            sun_vector = sh._compute_sun_vector(sun_altitude_deg, sun_azimuth_deg)
+            if profiler:
+                start = profiler.add("sun_position", start)
+
+            radiation = self._compute_radiation()
+            if profiler:
+                profiler.add("radiation", start)
+
+            self._step_environment = (key, sun_altitude_deg, sun_azimuth_deg, sun_vector, radiation)
+        return self._step_environment[1:]
+
+    def _compute_radiation(self):
+        '''
+        Returns:
+            (tuple): (direct, diffuse, reflective) radiation hitting the ground at the current time
+                (direct radiation attenuated by the clouds, if any).
+        '''
+        direct_rads, diffuse_rads, reflective_rads = self.ephemeris.get_radiation(self.step_index)
+
+        return direct_rads * self._get_cloud_transmittance(), diffuse_rads, reflective_rads
+
     def get_local_time(self):
         return (self.time + self.time.utcoffset())
 
+    def _get_optimal_grid(self):
+        '''
+        Returns:
+            (tuple): (panel normals, diffuse tilt factors, reflective tilt factors) for every
+                orientation searched by the optimal agent. Built once, since none depend on the sun.
+        '''
+        if self._optimal_grid is None:
+            angles = np.arange(-90, 90, self.optimal_grid_step)
+            panel_ew_deg, panel_ns_deg = [grid.flatten() for grid in np.meshgrid(angles, angles, indexing="ij")]
+            self._optimal_grid = (sh._compute_panel_normal_vectors(panel_ns_deg, panel_ew_deg),
+                                    sh._compute_diffuse_radiation_tilt_factor(panel_ns_deg, panel_ew_deg),
+                                    sh._compute_reflective_radiation_tilt_factor(panel_ns_deg, panel_ew_deg))
+        return self._optimal_grid
+
     '''
     Computes the optimal reward possible for a given sun position.
     Ignores current position.
     '''
     def _compute_optimal_reward(self, sun_altitude_deg, sun_azimuth_deg):
-        optimal_panel_ew = 0
-        optimal_panel_ns = 0
-        optimal_reward = -.001
+        panel_normals, diffuse_tilt_factors, reflective_tilt_factors = self._get_optimal_grid()
+        direct_rads, diffuse_rads, reflective_rads = self._compute_radiation()
 
-        # Iterate over all possible panel angles.
-        for panel_ew_deg in xrange(-90, 90, 5):
-            for panel_ns_deg in xrange(-90, 90, 5):
-
-                # Check reward.
-                reward = self._compute_flux(sun_altitude_deg, sun_azimuth_deg, panel_ns_deg, panel_ew_deg)
-                if reward > optimal_reward:
-                    optimal_reward = reward
+        # Evaluate the flux of every orientation at once.
+        fluxes = direct_rads * sh._compute_direct_radiation_tilt_factors(panel_normals, sun_altitude_deg, sun_azimuth_deg) + \
+                    diffuse_rads * diffuse_tilt_factors + \
+                    reflective_rads * reflective_tilt_factors
+        optimal_reward = max(np.max(fluxes), -.001)
 
         power = self.panel.get_power(optimal_reward)
         energy = power * self.timestep * 60 # Joules
@@ -304,6 +488,52 @@ class SolarOOMDP(OOMDP):
 
         return optimal_reward
 
+    def _get_bandit_grid(self):
+        '''
+        Returns:
+            (tuple): (ns angles, ew angles, panel normals, diffuse tilt factors, reflective tilt factors)
+                of the bandit arms, aligned with get_bandit_actions(). Built once.
+        '''
+        if self._bandit_grid is None:
+            panel_ns_deg, panel_ew_deg = np.clip(self.action_space.get_bandit_angles(), -90, 90).T
+            self._bandit_grid = (panel_ns_deg, panel_ew_deg,
+                                    sh._compute_panel_normal_vectors(panel_ns_deg, panel_ew_deg),
+                                    sh._compute_diffuse_radiation_tilt_factor(panel_ns_deg, panel_ew_deg),
+                                    sh._compute_reflective_radiation_tilt_factor(panel_ns_deg, panel_ew_deg))
+        return self._bandit_grid
+
+    def reward_all_arms(self, state):
+        '''
+        Args:
+            state (SolarOOMDPState or CompactSolarOOMDPState): The current state (moves start from its panel).
+
+        Returns:
+            (np.array): Reward (MJ) of every bandit action, aligned with get_bandit_actions(): the energy
+                the panel makes at the current step set to the arm's orientation, minus the cost of moving there.
+
+        Summary:
+            Full-information rewards, e.g. for off-policy evaluation. Like the optimal reward, each orientation
+            is credited with the energy it makes at the current step (_reward_func credits the energy of the
+            orientation the panel is in when the action is taken, i.e. one step later).
+        '''
+        panel_ns_deg, panel_ew_deg, panel_normals, diffuse_tilt_factors, reflective_tilt_factors = self._get_bandit_grid()
+        sun_altitude_deg, sun_azimuth_deg = self.ephemeris.get_local_sun_angles(self.step_index)
+        direct_rads, diffuse_rads, reflective_rads = self._compute_radiation()
+
+        # Evaluate the flux of every arm at once.
+        fluxes = direct_rads * sh._compute_direct_radiation_tilt_factors(panel_normals, sun_altitude_deg, sun_azimuth_deg) + \
+                    diffuse_rads * diffuse_tilt_factors + \
+                    reflective_rads * reflective_tilt_factors
+        energies = self.panel.get_power(fluxes) * self.timestep * 60 # Joules
+
+        # Cost of moving from the current panel to each arm, unless the panel stays put overnight.
+        costs = 0
+        if not self.ephemeris.is_night_jump(self.step_index):
+            costs = self.panel.get_move_energy_for_axis('ew', m.radians(state.get_panel_angle_ew()), np.radians(panel_ew_deg)) + \
+                    self.panel.get_move_energy_for_axis('ns', m.radians(state.get_panel_angle_ns()), np.radians(panel_ns_deg))
+
+        return (energies - costs) / 1000000.0
+
 
     def _create_moved_panel(self, state, action, panel_index):
         '''
@@ -315,14 +545,34 @@ class SolarOOMDP(OOMDP):
         Returns:
             (OOMDPObject): The panel object, moved according to @action.
         '''
+        bounded_panel_angle_ew, bounded_panel_angle_ns = self._compute_moved_panel_angles(state, action, panel_index)
+
+        # Make panel object.
+        panel_attributes = {}
+        panel_attributes["angle_ew"] = bounded_panel_angle_ew
+        panel_attributes["angle_ns"] = bounded_panel_angle_ns
+        panel = OOMDPObject(attributes=panel_attributes, name="panel_" + str(panel_index))
+
+        return panel
+
+    def _compute_moved_panel_angles(self, state, action, panel_index=0):
+        '''
+        Args;
+            state (State)
+            action (str)
+            panel_index (int)
+
+        Returns:
+            (tuple): (ew, ns) angles of the panel, moved according to @action.
+        '''
         panel_angle_ew = state.get_panel_angle_ew(panel_index=panel_index)
         panel_angle_ns = state.get_panel_angle_ns(panel_index=panel_index)
 
-        if "," in action:
+        if self.action_space.is_bandit_action(action):
             # Bandit action.
-            ns_act, ew_act = action.split(",")
-            bounded_panel_angle_ew = max(min(int(ew_act), 90), -90)
-            bounded_panel_angle_ns = max(min(int(ns_act), 90), -90)
+            ns_act, ew_act = self.action_space.get_bandit_angle_pair(action)
+            bounded_panel_angle_ew = max(min(ew_act, 90), -90)
+            bounded_panel_angle_ns = max(min(ns_act, 90), -90)
         else:
             # Compute new angles
             ew_step, ns_step = {"panel_forward_ew": (self.panel_step, 0),
@@ -334,37 +584,49 @@ class SolarOOMDP(OOMDP):
             bounded_panel_angle_ew = max(min(new_panel_angle_ew, 90), -90)
             bounded_panel_angle_ns = max(min(new_panel_angle_ns, 90), -90)
 
-        # Make panel object.
-        panel_attributes = {}
-        panel_attributes["angle_ew"] = bounded_panel_angle_ew
-        panel_attributes["angle_ns"] = bounded_panel_angle_ns
-        panel = OOMDPObject(attributes=panel_attributes, name="panel_" + str(panel_index))
-
-        return panel
+        return bounded_panel_angle_ew, bounded_panel_angle_ns
 
     def _transition_func(self, state, action):
         '''
         Args:
             (OOMDP State)
-            action (str)
+            action (str or int): An action or its id in self.action_space.
 
         Returns
             (OOMDP State)
         '''
+        profiler = self.profiler
+        if profiler:
+            start = transition_start = time.time()
+
         self._error_check(state, action)
+        action = self.action_space.get_action(action)
+
+        night_jump = self.ephemeris.is_night_jump(self.step_index)
+        self.step_index += 1
+        self.time = self.ephemeris.get_time(self.step_index)
+        if profiler:
+            start = profiler.add("sun_position", start)
+
+        if self.compact_state:
+            # Panels only move during the day (and never for the optimal agent).
+            if night_jump or action == "optimal":
+                panel_angle_ew, panel_angle_ns = state.get_panel_angle_ew(), state.get_panel_angle_ns()
+            else:
+                panel_angle_ew, panel_angle_ns = self._compute_moved_panel_angles(state, action)
+            if profiler:
+                start = profiler.add("panel_motion", start)
 
-        if self.get_local_time().timetuple().tm_hour >= 16: # or self.get_local_time().timetuple().tm_hour <= 6:
-            self.time += datetime.timedelta(hours=13)
-            new_panels = state.get_panels()
-        else:
-            self.time += datetime.timedelta(minutes=self.timestep)
+            next_state = self._create_compact_state(panel_angle_ew, panel_angle_ns, self.step_index)
+            if profiler:
+                profiler.add("state_construction", start)
+                profiler.add("transition_func", transition_start)
 
-            # Remake or move clouds.
-            if self.get_local_time().hour == 1 and self.get_local_time().minute == 0:
-                self.clouds = self._generate_clouds() if self.cloud_mode else []
-            elif self.clouds != []:
-                self._move_clouds()
+            return next_state
 
+        if night_jump:
+            new_panels = state.get_panels()
+        else:
             # If we're computing optimal-greedy behavior, the new state is irrelevent (we search over all anyway).
             if action == "optimal":
                 new_panels = state.get_panels()
@@ -376,17 +638,22 @@ class SolarOOMDP(OOMDP):
                     next_panel = self._create_moved_panel(state, action, panel_index=i)
 
                     new_panels.append(next_panel)
+        if profiler:
+            start = profiler.add("panel_motion", start)
 
-        next_state = self._create_state(new_panels, self.time)
+        next_state = self._create_state(new_panels, self.step_index)
         next_state.update()
+        if profiler:
+            profiler.add("state_construction", start)
+            profiler.add("transition_func", transition_start)
 
         return next_state
 
-    def _create_state(self, panels, time):
+    def _create_state(self, panels, step):
         '''
         Args:
             panels (list): Contains attribute dictionaries for panel objects.
-            time (datetime)
+            step (int): Index into the ephemeris table.
 
         Returns:
             (SolarOOMDPState)
@@ -396,8 +663,8 @@ class SolarOOMDP(OOMDP):
 
         # Sun.
         sun_attributes = {}
-        sun_angle_AZ = sh._compute_sun_azimuth(self.latitude_deg, self.longitude_deg, time)
-        sun_angle_ALT = sh._compute_sun_altitude(self.latitude_deg, self.longitude_deg, time)
+        time = self.ephemeris.get_time(step)
+        sun_angle_ALT, sun_angle_AZ = self.ephemeris.get_sun_angles(step)
         
         # Image stuff.
         if self.image_mode:
@@ -405,7 +672,7 @@ class SolarOOMDP(OOMDP):
             bounded_panel_angle_ew = max(min(panels[0]["angle_ew"], 90), -90)
             bounded_panel_angle_ns = max(min(panels[0]["angle_ns"], 90), -90)
             # Set attributes as pixels.
-            image = self._create_sun_image(sun_angle_AZ, sun_angle_ALT, bounded_panel_angle_ns, bounded_panel_angle_ew)
+            image = self._create_sun_image(sun_angle_AZ, sun_angle_ALT, bounded_panel_angle_ns, bounded_panel_angle_ew, step)
             for i in range (self.img_dims):
                 for j in range (self.img_dims):
                     idx = i*self.img_dims + j
@@ -419,48 +686,117 @@ class SolarOOMDP(OOMDP):
 
         return SolarOOMDPState(self.objects, date_time=time, longitude=self.longitude_deg, latitude=self.latitude_deg, sun_angle_AZ = sun_angle_AZ, sun_angle_ALT = sun_angle_ALT)
 
+    def _create_compact_state(self, panel_angle_ew, panel_angle_ns, step):
+        '''
+        Args:
+            panel_angle_ew (float)
+            panel_angle_ns (float)
+            step (int): Index into the ephemeris table.
+
+        Returns:
+            (CompactSolarOOMDPState)
+        '''
+        time = self.ephemeris.get_time(step)
+        sun_angle_ALT, sun_angle_AZ = self.ephemeris.get_sun_angles(step)
+
+        image = None
+        if self.image_mode:
+            bounded_panel_angle_ew = max(min(panel_angle_ew, 90), -90)
+            bounded_panel_angle_ns = max(min(panel_angle_ns, 90), -90)
+            image = self._create_sun_image(sun_angle_AZ, sun_angle_ALT, bounded_panel_angle_ns, bounded_panel_angle_ew, step)
+
+        return CompactSolarOOMDPState(time, self.longitude_deg, self.latitude_deg, sun_angle_AZ, sun_angle_ALT, panel_angle_ew, panel_angle_ns, image)
+
     # -------------------
     # --- IMAGE STUFF ---
     # -------------------
 
     def _get_sun_x_y(self, sun_angle_AZ, sun_angle_ALT):
-        x = self.img_dims * (1 + m.sin(m.radians(sun_angle_AZ)))/2
-        y = self.img_dims * m.sin(m.radians(sun_angle_ALT))/2
-        return x, y
-
-    def _create_sun_image(self, sun_angle_AZ, sun_angle_ALT, panel_angle_ns, panel_angle_ew):
-        # Create image of the sun, given alt and az
-        sun_dim = self.img_dims/8.0
-
-        # For viewing purposes, we normalize between 0 and 1 on the x axis and 0 to .5 on the y axis
-        panel_tilt_offset_y = m.sin(m.radians(panel_angle_ns))
-        panel_tilt_offset_x = m.sin(m.radians(panel_angle_ew))
-
-        percent_in_sky_x = m.sin(m.radians(sun_angle_AZ))
-        percent_in_sky_y = m.sin(m.radians(sun_angle_ALT))
-        x, y = self._get_sun_x_y(sun_angle_AZ, sun_angle_ALT)
-        image = [np.ones(self.img_dims)*0.6 for l in [[0] * self.img_dims] * self.img_dims]
-
-        # Make gaussian sun
-        for i in range (self.img_dims):
-            for j in range (self.img_dims):
-                image[i][j] = min(image[i][j] + sh._gaussian(j, x, sun_dim) * sh._gaussian(i, y, sun_dim), 1.0)
-
-                # Add cloud cover.
-                for cloud in self.clouds:
-                    image[i][j] -= (sh._gaussian(j, cloud.get_mu()[0], cloud.get_sigma()[0][0]) * \
-                                    sh._gaussian(i, cloud.get_mu()[1], cloud.get_sigma()[1][1]) * cloud.get_intensity())
-
-                # Backcompute the altitude of the pixel; if it is below the horizon, render black.
-                alt_pix = 2*float(i)/self.img_dims + panel_tilt_offset_y
-                if alt_pix < 0:
-                    image[i][j] = 1
+        return sh._get_sun_x_y(sun_angle_AZ, sun_angle_ALT, self.img_dims)
+
+    def _create_sun_image(self, sun_angle_AZ, sun_angle_ALT, panel_angle_ns, panel_angle_ew, step):
+        # Create image of the sun, given alt and az (and the clouds of @step): only the horizon depends on the panel.
+        sky = self._get_sky_frame(step, sun_angle_AZ, sun_angle_ALT)
+        image = sh._apply_horizon_mask(sky[np.newaxis].astype(float), [panel_angle_ns], self.img_dims)[0]
 
         # Show image (for testing purposes)
         # self._show_image(image)
 
         return image
 
+    def _get_sky_frame(self, step, sun_angle_AZ, sun_angle_ALT):
+        '''
+        Args:
+            step (int): Index into the ephemeris table.
+            sun_angle_AZ (float): Sun azimuth at @step.
+            sun_angle_ALT (float): Sun altitude at @step.
+
+        Returns:
+            (np.array): img_dims x img_dims float32 sky (sun and clouds of @step, no horizon mask), rendered
+                the first time the instance reaches @step and replayed by later episodes and by agents
+                run on the instance before the MDP moves to another one.
+
+        Summary:
+            Only the current instance is kept (in one float32 array, grown geometrically),
+            so a 52k step run holds ~50MB of 16 x 16 frames however many instances it has.
+        '''
+        if self.sky_frames_instance != self.instance:
+            self._clear_sky_frames()
+            self.sky_frames_instance = self.instance
+
+        if step >= len(self.sky_frames):
+            num_steps = max(step + 1, 2 * len(self.sky_frames), 256)
+            self.sky_frames = np.concatenate([self.sky_frames, np.zeros((num_steps - len(self.sky_frames), self.img_dims, self.img_dims), dtype=np.float32)])
+            self.sky_frames_rendered = np.concatenate([self.sky_frames_rendered, np.zeros(num_steps - len(self.sky_frames_rendered), dtype=bool)])
+
+        if not self.sky_frames_rendered[step]:
+            cloud_fields = [self._get_weather().get_clouds(step)] if self.cloud_mode else None
+            self.sky_frames[step] = self._create_sky_images([sun_angle_AZ], [sun_angle_ALT], cloud_fields)[0]
+            self.sky_frames_rendered[step] = True
+
+        return self.sky_frames[step]
+
+    def _clear_sky_frames(self):
+        self.sky_frames = np.zeros((0, self.img_dims, self.img_dims), dtype=np.float32)
+        self.sky_frames_rendered = np.zeros(0, dtype=bool)
+        self.sky_frames_instance = None
+
+    def _create_sun_images(self, sun_angles_AZ, sun_angles_ALT, panel_angles_ns, cloud_fields=None):
+        '''
+        Args:
+            sun_angles_AZ (list or np.array)
+            sun_angles_ALT (list or np.array)
+            panel_angles_ns (list or np.array)
+            cloud_fields (list of CloudField): Clouds per frame (None for clear skies).
+
+        Returns:
+            (np.array): T x img_dims x img_dims, one frame per timestep/instance.
+        '''
+        return sh._apply_horizon_mask(self._create_sky_images(sun_angles_AZ, sun_angles_ALT, cloud_fields), panel_angles_ns, self.img_dims)
+
+    def _create_sky_images(self, sun_angles_AZ, sun_angles_ALT, cloud_fields=None):
+        '''
+        Args:
+            sun_angles_AZ (list or np.array)
+            sun_angles_ALT (list or np.array)
+            cloud_fields (list of CloudField): Clouds per frame (None for clear skies).
+
+        Returns:
+            (np.array): T x img_dims x img_dims sky frames, before the horizon mask.
+        '''
+        if self.profiler:
+            start = time.time()
+
+        cloud_arrays = None
+        if cloud_fields is not None and any(len(clouds) > 0 for clouds in cloud_fields):
+            cloud_arrays = sh._get_cloud_arrays(cloud_fields)
+        images = sh._render_sky_images(sun_angles_AZ, sun_angles_ALT, self.img_dims, cloud_arrays)
+
+        if self.profiler:
+            self.profiler.add("image_rendering", start)
+
+        return images
+
     def _show_image(self, image):
         plt.imshow(image, cmap='gray', vmin=00.0, vmax=1.0, interpolation='nearest')
         plt.gca().invert_yaxis()
@@ -471,10 +807,12 @@ class SolarOOMDP(OOMDP):
         plt.show()
 
     def __str__(self):
-        percept = "true"
+        # One suffix per percept type of solar_experiments._make_mdp (results are stored by name).
+        percept = {(False, False):"true", # angles
+                   (True, True):"image",
+                   (True, False):"clear_image",
+                   (False, True):"cloudy_angles"}[(bool(self.image_mode), bool(self.cloud_mode))]
         ext = ""
-        if self.image_mode and self.cloud_mode:
-            percept = "image"
         if self.dual_axis:
             ext = "d_"
         return "solar_" + ext + self.name_ext + "_p-" + str(self.panel_step) + "_" + percept
@@ -489,11 +827,11 @@ class SolarOOMDP(OOMDP):
             Checks to make sure the received state and action are of the right type.
         '''
 
-        if action not in SolarOOMDP.ACTIONS + self.get_optimal_actions() + self.get_bandit_actions():
+        if not self.action_space.is_valid(action):
             print "Error: the action provided (" + str(action) + ") was invalid."
             quit()
 
-        if not isinstance(state, SolarOOMDPState):
+        if not isinstance(state, (SolarOOMDPState, CompactSolarOOMDPState)):
             print "Error: the given state (" + str(state) + ") was not of the correct class."
             quit()
 
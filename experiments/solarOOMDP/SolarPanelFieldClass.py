@@ -0,0 +1,198 @@
+'''
+SolarPanelFieldClass.py: Contains the SolarPanelField class.
+
+Simulates a field of trackers (a rows x columns grid of panels at one location)
+sharing a clock, with panel angles held as arrays and the flux of every panel,
+including the shadows of its neighbours, computed in one vectorized call.
+'''
+
+# Python imports.
+import numpy as np
+
+# Local imports.
+from SunEphemerisClass import SunEphemeris
+from SolarVectorEnvClass import SolarVectorEnv
+from SolarActionSpaceClass import SolarActionSpace
+import solar_helpers as sh
+
+class SolarPanelField(object):
+    ''' Class for a field of panels stepped together. '''
+
+    def __init__(self,
+                panel,
+                date_time,
+                latitude_deg,
+                longitude_deg,
+                rows=10,
+                columns=10,
+                row_spacing=3.0,
+                column_spacing=3.0,
+                shading_radius=1,
+                timestep=30,
+                panel_step=10,
+                reflective_index=0.65,
+                dual_axis=True,
+                skip_night=False):
+        '''
+        Args:
+            panel (Panel): Specs shared by every panel of the field.
+            date_time (datetime): Localized start time.
+            latitude_deg (float)
+            longitude_deg (float)
+            rows (int): Number of rows (along the y axis of the sun vectors).
+            columns (int): Number of panels per row (along the x axis).
+            row_spacing (float): Distance (meters) between the centers of adjacent rows.
+            column_spacing (float): Distance (meters) between the centers of adjacent panels in a row.
+            shading_radius (int): Panels up to this many rows/columns away can shade each other (0 turns shading off).
+            timestep (float): Minutes per step.
+            panel_step (int): Degrees moved by an incremental action.
+            reflective_index (float)
+            dual_axis (bool)
+            skip_night (bool): See SunEphemeris.
+        '''
+        self.panel = panel
+        self.latitude_deg = latitude_deg
+        self.longitude_deg = longitude_deg
+        self.rows, self.columns = rows, columns
+        self.num_panels = rows * columns
+        self.timestep = timestep
+        self.panel_step = panel_step
+        self.reflective_index = reflective_index
+        self.dual_axis = dual_axis
+        self.actions = SolarVectorEnv.ACTIONS if dual_axis else SolarVectorEnv.SINGLE_AXIS_ACTIONS
+        self.action_space = SolarActionSpace(self.actions, panel_step, dual_axis)
+        self.ephemeris = SunEphemeris(latitude_deg, longitude_deg, date_time, timestep, skip_night=skip_night)
+
+        # Layout: panel i sits in row i // columns, column i % columns.
+        panel_rows, panel_columns = np.divmod(np.arange(self.num_panels), columns)
+        self.positions = np.stack([panel_columns * column_spacing, panel_rows * row_spacing, np.zeros(self.num_panels)], axis=1)
+
+        # Neighbours within shading_radius (K offsets, N x K indices).
+        steps = [(dr, dc) for dr in xrange(-shading_radius, shading_radius + 1) for dc in xrange(-shading_radius, shading_radius + 1) if (dr, dc) != (0, 0)]
+        steps = np.array(steps, dtype=int).reshape(-1, 2)
+        neighbour_rows, neighbour_columns = panel_rows[:, np.newaxis] + steps[:, 0], panel_columns[:, np.newaxis] + steps[:, 1]
+        self.neighbour_offsets = np.stack([steps[:, 1] * column_spacing, steps[:, 0] * row_spacing, np.zeros(len(steps))], axis=1)
+        self.neighbour_mask = (neighbour_rows >= 0) & (neighbour_rows < rows) & (neighbour_columns >= 0) & (neighbour_columns < columns)
+        self.neighbour_indices = np.where(self.neighbour_mask, neighbour_rows * columns + neighbour_columns, 0)
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Returns:
+            (np.array): N x 4 observations of the initial state.
+        '''
+        self.step_index = 0
+        self.panel_angles_ew = np.zeros(self.num_panels)
+        self.panel_angles_ns = np.zeros(self.num_panels)
+
+        return self.get_observations()
+
+    def get_num_panels(self):
+        return self.num_panels
+
+    def get_panel_positions(self):
+        '''
+        Returns:
+            (np.array): N x 3 ground positions (meters) of the panel centers.
+        '''
+        return self.positions
+
+    def get_local_time(self):
+        return self.ephemeris.get_local_time(self.step_index)
+
+    def get_observations(self):
+        '''
+        Returns:
+            (np.array): N x 4 rows of (panel_ew, panel_ns, sun_AZ, sun_ALT).
+        '''
+        sun_angle_ALT, sun_angle_AZ = self.ephemeris.get_sun_angles(self.step_index)
+        sun_angles = np.tile([sun_angle_AZ, sun_angle_ALT], (self.num_panels, 1))
+
+        return np.hstack([np.stack([self.panel_angles_ew, self.panel_angles_ns], axis=1), sun_angles])
+
+    # ----------------------------------
+    # --- REWARD AND TRANSITION FUNC ---
+    # ----------------------------------
+
+    def step(self, actions):
+        '''
+        Args:
+            actions (int or np.array): One action id of self.action_space for the whole field,
+                N action ids (one per panel), or an N x 2 array of (ns, ew) target angles
+                ("optimal" isn't supported).
+
+        Returns:
+            (tuple): (np.array of N panel rewards, float field reward, np.array of N next observations)
+        '''
+        actions = np.asarray(actions)
+        if actions.ndim == 2:
+            new_ns, new_ew = actions[:, 0], actions[:, 1]
+        else:
+            actions = np.broadcast_to(actions, (self.num_panels,))
+            new_ns, new_ew = self.action_space.get_target_angles(actions, self.panel_angles_ns, self.panel_angles_ew, self.panel_step)
+        new_ns, new_ew = np.clip(new_ns, -90, 90), np.clip(new_ew, -90, 90)
+
+        panel_rewards = (self._compute_energy() - self._compute_motion_cost(new_ns, new_ew)) / 1000000.0 # Convert Watts to Megawatts
+        self._transition(new_ns, new_ew)
+
+        return panel_rewards, panel_rewards.sum(), self.get_observations()
+
+    def _compute_energy(self):
+        '''
+        Returns:
+            (np.array): Energy (Joules) harvested by each panel over the current step.
+        '''
+        sun_altitude, sun_azimuth = self.ephemeris.get_local_sun_angles(self.step_index)
+        day = self.get_local_time().timetuple().tm_yday
+
+        direct_rads, diffuse_rads, reflective_rads = sh._compute_radiation_components(day, sun_altitude, self.reflective_index)
+        panel_normals = sh._compute_panel_normal_vectors(self.panel_angles_ns, self.panel_angles_ew)
+        sun_vector = sh._compute_sun_vector(sun_altitude, sun_azimuth)
+
+        flux = direct_rads * np.maximum(np.dot(panel_normals, sun_vector), 0) * (1 - self.compute_shaded_fractions(panel_normals, sun_vector)) + \
+                diffuse_rads * sh._compute_diffuse_radiation_tilt_factor(self.panel_angles_ns, self.panel_angles_ew) + \
+                reflective_rads * sh._compute_reflective_radiation_tilt_factor(self.panel_angles_ns, self.panel_angles_ew)
+
+        return self.panel.get_power(flux) * self.timestep * 60
+
+    def compute_shaded_fractions(self, panel_normals=None, sun_vector=None):
+        '''
+        Args:
+            panel_normals (np.array): N x 3 (defaults to the current panel angles).
+            sun_vector (np.array): 3 (defaults to the sun used for irradiance at the current step).
+
+        Returns:
+            (np.array): The fraction of each panel in the shadow of its neighbours.
+        '''
+        if panel_normals is None:
+            panel_normals = sh._compute_panel_normal_vectors(self.panel_angles_ns, self.panel_angles_ew)
+        if sun_vector is None:
+            sun_vector = sh._compute_sun_vector(*self.ephemeris.get_local_sun_angles(self.step_index))
+
+        return sh._compute_shaded_fractions(panel_normals, sun_vector, self.neighbour_offsets, self.neighbour_indices,
+                                            self.neighbour_mask, self.panel.x_dim, self.panel.y_dim)
+
+    def _compute_motion_cost(self, new_ns, new_ew):
+        '''
+        Args:
+            new_ns (np.array): N target ns angles (degrees).
+            new_ew (np.array): N target ew angles (degrees).
+
+        Returns:
+            (np.array): Energy (Joules) spent by each panel's actuators (none if the field is held overnight).
+        '''
+        if self.ephemeris.is_night_jump(self.step_index):
+            return np.zeros(self.num_panels)
+
+        cost_ew = self.panel.get_move_energy_for_axis('ew', np.radians(self.panel_angles_ew), np.radians(new_ew))
+        cost_ns = self.panel.get_move_energy_for_axis('ns', np.radians(self.panel_angles_ns), np.radians(new_ns))
+
+        return cost_ew + cost_ns
+
+    def _transition(self, new_ns, new_ew):
+        # Panels are held when the clock jumps to the next morning.
+        if not self.ephemeris.is_night_jump(self.step_index):
+            self.panel_angles_ew, self.panel_angles_ns = new_ew, new_ns
+
+        self.step_index += 1
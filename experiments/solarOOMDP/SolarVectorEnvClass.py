@@ -0,0 +1,242 @@
+'''
+SolarVectorEnvClass.py: Contains the SolarVectorEnv class.
+
+Simulates N independent SolarOOMDP instances (one per location) in lockstep,
+with locations, panel angles and clocks held as arrays.
+'''
+
+# Python imports.
+import numpy as np
+
+# Local imports.
+from SunEphemerisClass import SunEphemeris, _compute_sun_altitude_azimuth
+from DaylightIndexClass import DaylightIndex
+from SolarActionSpaceClass import SolarActionSpace
+import solar_helpers as sh
+
+class SolarVectorEnv(object):
+    ''' Class for a batch of Solar MDP instances stepped together. '''
+
+    # Same action sets (and order) as SolarOOMDP.
+    ACTIONS = ["panel_forward_ns", "panel_back_ns", "do_nothing", "panel_forward_ew", "panel_back_ew"]
+    SINGLE_AXIS_ACTIONS = ["do_nothing", "panel_forward_ew", "panel_back_ew"]
+
+    def __init__(self,
+                panel,
+                date_time,
+                latitudes_deg,
+                longitudes_deg,
+                timestep=30,
+                panel_step=10,
+                reflective_index=0.65,
+                img_dims=16,
+                dual_axis=True,
+                image_mode=False,
+                chunk_size=256,
+                skip_night=False):
+        '''
+        Args:
+            panel (Panel)
+            date_time (datetime or list of datetime): Localized start time (shared or per instance).
+            latitudes_deg (list of float)
+            longitudes_deg (list of float)
+            timestep (float): Minutes per step.
+            panel_step (int): Degrees moved by an incremental action.
+            reflective_index (float)
+            img_dims (int)
+            dual_axis (bool)
+            image_mode (bool): If true observations are the panel angles and a rendered sky.
+            chunk_size (int): Number of steps of clocks/sun positions precomputed at a time.
+            skip_night (bool): If true, each clock goes from its last daylight step to its next sunrise (see SunEphemeris).
+        '''
+        self.panel = panel
+        self.latitudes_deg = np.asarray(latitudes_deg, dtype=float)
+        self.longitudes_deg = np.asarray(longitudes_deg, dtype=float)
+        self.num_instances = len(self.latitudes_deg)
+        self.timestep = timestep
+        self.panel_step = panel_step
+        self.reflective_index = reflective_index
+        self.img_dims = img_dims
+        self.dual_axis = dual_axis
+        self.image_mode = image_mode
+        self.actions = SolarVectorEnv.ACTIONS if dual_axis else SolarVectorEnv.SINGLE_AXIS_ACTIONS
+        self.action_space = SolarActionSpace(self.actions, panel_step, dual_axis)
+
+        # Clocks: naive wall-clock times plus each instance's UTC offset.
+        date_times = date_time if isinstance(date_time, list) else [date_time] * self.num_instances
+        self.init_times = np.array([np.datetime64(d.replace(tzinfo=None), "us") for d in date_times])
+        self.utc_offsets = np.array([np.timedelta64(d.utcoffset(), "us") for d in date_times])
+        self.night_jump = np.timedelta64(SunEphemeris.NIGHT_JUMP, "us")
+        self.step_delta = np.timedelta64(int(round(timestep * 60 * 1e6)), "us")
+        self.skip_night = skip_night
+        self.daylight_indices = [DaylightIndex(self._make_local_altitude_func(i), SunEphemeris.DAYLIGHT_MIN_ALTITUDE) for i in xrange(self.num_instances)] if skip_night else None
+
+        # Clocks don't depend on actions, so times and sun positions are tabulated ahead (steps x N).
+        self.chunk_size = chunk_size
+        self.times = self.init_times[np.newaxis, :]
+        self.night_jumps = np.zeros((0, self.num_instances), dtype=bool)
+        self.sun_angles_ALT, self.sun_angles_AZ = np.zeros((2, 0, self.num_instances))
+        self.local_sun_angles_ALT, self.local_sun_angles_AZ = np.zeros((2, 0, self.num_instances))
+        self.days = np.zeros((0, self.num_instances), dtype=int)
+
+        self.reset()
+
+    def reset(self):
+        '''
+        Returns:
+            (np.array): N x num_feats observations of the initial states.
+        '''
+        self.step_index = 0
+        self.panel_angles_ew = np.zeros(self.num_instances)
+        self.panel_angles_ns = np.zeros(self.num_instances)
+        self._ensure_steps(1)
+
+        return self.get_observations()
+
+    def get_num_instances(self):
+        return self.num_instances
+
+    def get_local_times(self):
+        return self.times[self.step_index] + self.utc_offsets
+
+    def get_observations(self):
+        '''
+        Returns:
+            (np.array): N x 4 rows of (panel_ew, panel_ns, sun_AZ, sun_ALT), or in image mode
+                N x (2 + img_dims**2) rows of (panel_ew, panel_ns, pixels).
+        '''
+        panels = np.stack([self.panel_angles_ew, self.panel_angles_ns], axis=1)
+        sun_angles_AZ, sun_angles_ALT = self.sun_angles_AZ[self.step_index], self.sun_angles_ALT[self.step_index]
+        if self.image_mode:
+            images = sh._render_sun_images(sun_angles_AZ, sun_angles_ALT, self.panel_angles_ns, self.img_dims)
+            return np.hstack([panels, images.reshape(self.num_instances, -1)])
+
+        return np.hstack([panels, np.stack([sun_angles_AZ, sun_angles_ALT], axis=1)])
+
+    # ----------------------------------
+    # --- REWARD AND TRANSITION FUNC ---
+    # ----------------------------------
+
+    def step(self, actions):
+        '''
+        Args:
+            actions (np.array): Either N action ids of self.action_space (incremental or bandit moves,
+                "optimal" isn't supported), or an N x 2 array of (ns, ew) target angles (bandit moves).
+
+        Returns:
+            (tuple): (np.array of N rewards, np.array of N next observations)
+        '''
+        actions = np.asarray(actions)
+        if actions.ndim == 2:
+            new_ns, new_ew = actions[:, 0], actions[:, 1]
+        else:
+            new_ns, new_ew = self.action_space.get_target_angles(actions, self.panel_angles_ns, self.panel_angles_ew, self.panel_step)
+        new_ns, new_ew = np.clip(new_ns, -90, 90), np.clip(new_ew, -90, 90)
+
+        rewards = (self._compute_energy() - self._compute_motion_cost(new_ns, new_ew)) / 1000000.0 # Convert Watts to Megawatts
+        self._transition(new_ns, new_ew)
+
+        return rewards, self.get_observations()
+
+    def _compute_energy(self):
+        '''
+        Returns:
+            (np.array): Energy (Joules) harvested by each panel over the current step.
+        '''
+        sun_altitudes, sun_azimuths = self.local_sun_angles_ALT[self.step_index], self.local_sun_angles_AZ[self.step_index]
+
+        direct_rads, diffuse_rads, reflective_rads = sh._compute_radiation_components(self.days[self.step_index], sun_altitudes, self.reflective_index)
+        panel_normals = sh._compute_panel_normal_vectors(self.panel_angles_ns, self.panel_angles_ew)
+        sun_vectors = sh._compute_sun_vectors(sun_altitudes, sun_azimuths)
+
+        flux = direct_rads * np.maximum(np.sum(panel_normals * sun_vectors, axis=1), 0) + \
+                diffuse_rads * sh._compute_diffuse_radiation_tilt_factor(self.panel_angles_ns, self.panel_angles_ew) + \
+                reflective_rads * sh._compute_reflective_radiation_tilt_factor(self.panel_angles_ns, self.panel_angles_ew)
+
+        return self.panel.get_power(flux) * self.timestep * 60
+
+    def _compute_motion_cost(self, new_ns, new_ew):
+        '''
+        Args:
+            new_ns (np.array): N target ns angles (degrees).
+            new_ew (np.array): N target ew angles (degrees).
+
+        Returns:
+            (np.array): Energy (Joules) spent by each panel's actuators (none for panels held overnight).
+        '''
+        cost_ew = self.panel.get_move_energy_for_axis('ew', np.radians(self.panel_angles_ew), np.radians(new_ew))
+        cost_ns = self.panel.get_move_energy_for_axis('ns', np.radians(self.panel_angles_ns), np.radians(new_ns))
+
+        return np.where(self.night_jumps[self.step_index], 0.0, cost_ew + cost_ns)
+
+    def _transition(self, new_ns, new_ew):
+        # Instances past the evening cutoff jump to the next morning and keep their panels.
+        night = self.night_jumps[self.step_index]
+        self.panel_angles_ew = np.where(night, self.panel_angles_ew, new_ew)
+        self.panel_angles_ns = np.where(night, self.panel_angles_ns, new_ns)
+
+        self.step_index += 1
+        self._ensure_steps(self.step_index + 1)
+
+    def _get_julian_days(self, times):
+        return (times - np.datetime64("2000-01-01T12:00", "us")) / np.timedelta64(1, "D") + 2451545.0
+
+    def _make_local_altitude_func(self, instance):
+        '''
+        Returns:
+            (lambda): offsets (seconds since the instance's start) --> altitude of the sun used for irradiance.
+        '''
+        start_julian_day = self._get_julian_days(self.init_times[instance]) + self.utc_offsets[instance] / np.timedelta64(1, "D")
+        latitude_deg, longitude_deg = self.latitudes_deg[instance], self.longitudes_deg[instance]
+        return lambda offsets : _compute_sun_altitude_azimuth(latitude_deg, longitude_deg, start_julian_day + offsets / 86400.0)[0]
+
+    def _next_times(self, times):
+        '''
+        Args:
+            times (np.array): The current time of each instance.
+
+        Returns:
+            (tuple): (np.array of next times, np.array of bools: whether each skipped the night)
+        '''
+        if self.skip_night:
+            candidates = times + self.step_delta
+            offsets = (candidates - self.init_times) / np.timedelta64(1, "s")
+            next_offsets, night = np.array([index.get_next_time(offset) for index, offset in zip(self.daylight_indices, offsets)]).T
+            night = night.astype(bool)
+            sunrises = self.init_times + np.round(next_offsets * 1e6).astype(np.int64).astype("timedelta64[us]")
+            return np.where(night, sunrises, candidates), night
+
+        local_times = times + self.utc_offsets
+        hours = (local_times - local_times.astype("datetime64[D]")).astype("timedelta64[h]").astype(int)
+        night = hours >= SunEphemeris.NIGHT_HOUR
+        return times + np.where(night, self.night_jump, self.step_delta), night
+
+    def _ensure_steps(self, num_steps):
+        if num_steps <= len(self.sun_angles_ALT):
+            return
+
+        # Grow geometrically so long runs only rebuild a handful of times, advancing
+        # every clock one step at a time (vectorized over instances) from the last one.
+        num_steps = max(num_steps, len(self.sun_angles_ALT) + self.chunk_size, 2 * len(self.sun_angles_ALT))
+        times, new_times, new_night_jumps = self.times[-1], [], []
+        while len(self.times) + len(new_times) < num_steps + 1:
+            times, night = self._next_times(times)
+            new_times.append(times)
+            new_night_jumps.append(night)
+        self.times = np.concatenate([self.times, np.array(new_times)])
+        self.night_jumps = np.concatenate([self.night_jumps, np.array(new_night_jumps, dtype=bool).reshape(-1, self.num_instances)])
+
+        # Sun positions and days for the new steps, in one call.
+        new_times = self.times[len(self.sun_angles_ALT):num_steps]
+        julian_days = self._get_julian_days(new_times)
+        local_offsets = self.utc_offsets / np.timedelta64(1, "D")
+        local_times = new_times + self.utc_offsets
+
+        alt, az = _compute_sun_altitude_azimuth(self.latitudes_deg, self.longitudes_deg, julian_days)
+        local_alt, local_az = _compute_sun_altitude_azimuth(self.latitudes_deg, self.longitudes_deg, julian_days + local_offsets)
+        days = sh._get_days_of_year(local_times)
+
+        self.sun_angles_ALT, self.sun_angles_AZ = np.vstack([self.sun_angles_ALT, alt]), np.vstack([self.sun_angles_AZ, az])
+        self.local_sun_angles_ALT = np.vstack([self.local_sun_angles_ALT, local_alt])
+        self.local_sun_angles_AZ = np.vstack([self.local_sun_angles_AZ, local_az])
+        self.days = np.vstack([self.days, days])
@@ -0,0 +1,322 @@
+'''
+SunEphemerisClass.py: Contains the SunEphemeris class.
+
+Precomputes the simulation clock and the sun's altitude/azimuth for every step
+of a SolarOOMDP in one vectorized pass (a NumPy port of Pysolar 0.6's
+GetAltitude/GetAzimuth), so the MDP can look them up by step index.
+'''
+
+# Python imports.
+import math as m
+import datetime
+import numpy as np
+
+# Misc. imports.
+from Pysolar import constants
+
+# Local imports.
+from DaylightIndexClass import DaylightIndex
+import solar_helpers as sh
+
+# Pysolar tables as arrays.
+_L = [np.array(t, dtype=float) for t in [constants.L0, constants.L1, constants.L2, constants.L3, constants.L4, constants.L5]]
+_B = [np.array(t, dtype=float) for t in [constants.B0, constants.B1]]
+_R = [np.array(t, dtype=float) for t in [constants.R0, constants.R1, constants.R2, constants.R3, constants.R4]]
+_NUTATION_COEFFS = np.array(constants.nutation_coefficients, dtype=float)
+_ABERRATION_SIN_TERMS = np.array(constants.aberration_sin_terms, dtype=float)
+_POLY_ORDER = ["MeanElongationOfMoon", "MeanAnomalyOfSun", "MeanAnomalyOfMoon", "ArgumentOfLatitudeOfMoon", "LongitudeOfAscendingNode"]
+_POLY_COEFFS = np.array([dict(constants.coeff_list)[name] for name in _POLY_ORDER], dtype=float)
+
+class SunEphemeris(object):
+    ''' Step-indexed table of simulation times, sun positions and clear-sky radiation. '''
+
+    NIGHT_HOUR = 16 # Local hour after which the clock jumps ahead to the next morning.
+    NIGHT_JUMP = datetime.timedelta(hours=13)
+    DAYLIGHT_MIN_ALTITUDE = 1.0 # With skip_night, steps with the sun lower than this (direct radiation < 0.02 W/m^2) are skipped.
+
+    def __init__(self, latitude_deg, longitude_deg, start_time, timestep, chunk_size=2048, skip_night=False, reflective_index=None, weather=None, atlas=None):
+        '''
+        Args:
+            latitude_deg (float)
+            longitude_deg (float)
+            start_time (datetime): Localized datetime of step 0.
+            timestep (float): Minutes per step.
+            chunk_size (int): Number of steps computed each time the table grows.
+            skip_night (bool): If true, the clock goes from the last daylight step straight to the next
+                sunrise (of the sun used for irradiance), instead of jumping 13 hours after NIGHT_HOUR.
+            reflective_index (float): If given, the (direct, diffuse, reflective) radiation of each step is tabulated too.
+            weather (TMYWeather): If given, the radiation is read from its measured irradiance instead of the clear-sky model.
+            atlas (IrradianceAtlas): If given (with @reflective_index), tables are loaded from and saved to it.
+        '''
+        self.latitude_deg = latitude_deg
+        self.longitude_deg = longitude_deg
+        self.start_time = start_time
+        self.timestep = timestep
+        self.chunk_size = chunk_size
+        self.utc_offset = start_time.utcoffset()
+        self.skip_night = skip_night
+        self.daylight_index = DaylightIndex(self._get_local_sun_altitudes, SunEphemeris.DAYLIGHT_MIN_ALTITUDE) if skip_night else None
+        self.reflective_index = reflective_index
+        self.weather = weather
+
+        # Times are kept as microseconds since start_time.
+        self.time_offsets = np.zeros(1, dtype=np.int64)
+        self.night_jumps = np.zeros(0, dtype=bool)
+        self.sun_altitudes, self.sun_azimuths = np.zeros(0), np.zeros(0)
+        self.local_sun_altitudes, self.local_sun_azimuths = np.zeros(0), np.zeros(0)
+        self.radiation = np.zeros((3, 0))
+
+        self.atlas = atlas if reflective_index is not None else None
+        self.saved_steps = 0
+        if self.atlas is not None:
+            weather_id = weather.get_id() if weather is not None else None
+            self.atlas_key_fields = self.atlas._get_key_fields(latitude_deg, longitude_deg, start_time, timestep, reflective_index, skip_night, weather_id)
+            self.atlas_key = self.atlas.get_key(latitude_deg, longitude_deg, start_time, timestep, reflective_index, skip_night, weather_id)
+            self._load_from_atlas()
+
+    # --- Lookups ---
+
+    def get_time(self, step):
+        self._ensure_steps(step + 1)
+        return self._get_time_at_offset(self.time_offsets[step])
+
+    def get_local_time(self, step):
+        return self.get_time(step) + self.utc_offset
+
+    def is_night_jump(self, step):
+        '''
+        Returns:
+            (bool): True if the clock jumps overnight when leaving @step.
+        '''
+        self._ensure_steps(step + 2)
+        return self.night_jumps[step]
+
+    def get_sun_angles(self, step):
+        '''
+        Returns:
+            (tuple): (altitude_deg, azimuth_deg) at the state time of @step.
+        '''
+        self._ensure_steps(step + 1)
+        return self.sun_altitudes[step], self.sun_azimuths[step]
+
+    def get_local_sun_angles(self, step):
+        '''
+        Returns:
+            (tuple): (altitude_deg, azimuth_deg) at the local time of @step (used by the reward).
+        '''
+        self._ensure_steps(step + 1)
+        return self.local_sun_altitudes[step], self.local_sun_azimuths[step]
+
+    def get_radiation(self, step):
+        '''
+        Returns:
+            (tuple): (direct, diffuse, reflective) radiation hitting the ground at @step (needs reflective_index):
+                clear-sky (see solar_helpers._compute_radiation_components) or measured (see TMYWeather).
+        '''
+        self._ensure_steps(step + 1)
+        return float(self.radiation[0, step]), float(self.radiation[1, step]), float(self.radiation[2, step])
+
+    # --- Atlas ---
+
+    def _load_from_atlas(self):
+        tables = self.atlas.load(self.atlas_key)
+        if tables is None:
+            return
+
+        self.time_offsets, self.night_jumps = tables["time_offsets"], tables["night_jumps"]
+        self.sun_altitudes, self.sun_azimuths = tables["sun_altitudes"], tables["sun_azimuths"]
+        self.local_sun_altitudes, self.local_sun_azimuths = tables["local_sun_altitudes"], tables["local_sun_azimuths"]
+        self.radiation = tables["radiation"]
+        self.saved_steps = len(self.sun_altitudes)
+
+    def save_to_atlas(self):
+        '''
+        Summary:
+            Writes the tables to the atlas if they grew since they were loaded or last saved.
+        '''
+        if self.atlas is None or len(self.sun_altitudes) <= self.saved_steps:
+            return
+
+        self.atlas.save(self.atlas_key, {"time_offsets":self.time_offsets,
+                                            "night_jumps":self.night_jumps,
+                                            "sun_altitudes":self.sun_altitudes,
+                                            "sun_azimuths":self.sun_azimuths,
+                                            "local_sun_altitudes":self.local_sun_altitudes,
+                                            "local_sun_azimuths":self.local_sun_azimuths,
+                                            "radiation":self.radiation}, self.atlas_key_fields)
+        self.saved_steps = len(self.sun_altitudes)
+
+    # --- Table construction ---
+
+    def _get_time_at_offset(self, offset):
+        return self.start_time + datetime.timedelta(microseconds=int(offset))
+
+    def _get_local_sun_altitudes(self, offsets):
+        '''
+        Args:
+            offsets (np.array): Seconds since start_time.
+
+        Returns:
+            (np.array): Altitude (degrees) of the sun used for irradiance at each offset.
+        '''
+        julian_days = _compute_julian_day(self.start_time) + (offsets + self.utc_offset.total_seconds()) / 86400.0
+        return _compute_sun_altitude_azimuth(self.latitude_deg, self.longitude_deg, julian_days)[0]
+
+    def _next_time(self, time):
+        '''
+        Returns:
+            (tuple): (datetime, bool): the time of the next step and whether it skipped the night.
+        '''
+        if self.skip_night:
+            next_time = time + datetime.timedelta(minutes=self.timestep)
+            offset, jumped = self.daylight_index.get_next_time((next_time - self.start_time).total_seconds())
+            if jumped:
+                return self.start_time + datetime.timedelta(seconds=offset), True
+            return next_time, False
+
+        if (time + self.utc_offset).timetuple().tm_hour >= SunEphemeris.NIGHT_HOUR:
+            return time + SunEphemeris.NIGHT_JUMP, True
+        return time + datetime.timedelta(minutes=self.timestep), False
+
+    def _ensure_steps(self, num_steps):
+        if num_steps <= len(self.sun_altitudes):
+            return
+
+        # Grow geometrically so long runs only rebuild a handful of times.
+        num_steps = max(num_steps, len(self.sun_altitudes) + self.chunk_size, 2 * len(self.sun_altitudes))
+        time = self._get_time_at_offset(self.time_offsets[-1])
+        new_offsets, new_night_jumps = [], []
+        while len(self.time_offsets) + len(new_offsets) < num_steps + 1:
+            time, jumped = self._next_time(time)
+            delta = time - self.start_time
+            new_offsets.append((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+            new_night_jumps.append(jumped)
+        self.time_offsets = np.concatenate([self.time_offsets, np.array(new_offsets, dtype=np.int64)])
+        self.night_jumps = np.concatenate([self.night_jumps, np.array(new_night_jumps, dtype=bool)])
+
+        # Julian days of the wall-clock fields (Pysolar reads them as UTC).
+        first = len(self.sun_altitudes)
+        offsets = self.time_offsets[first:num_steps] / 1e6 / 86400.0
+        julian_days = _compute_julian_day(self.start_time) + offsets
+        local_offset = self.utc_offset.total_seconds() / 86400.0
+
+        alt, az = _compute_sun_altitude_azimuth(self.latitude_deg, self.longitude_deg, julian_days)
+        local_alt, local_az = _compute_sun_altitude_azimuth(self.latitude_deg, self.longitude_deg, julian_days + local_offset)
+
+        self.sun_altitudes = np.concatenate([self.sun_altitudes, alt])
+        self.sun_azimuths = np.concatenate([self.sun_azimuths, az])
+        self.local_sun_altitudes = np.concatenate([self.local_sun_altitudes, local_alt])
+        self.local_sun_azimuths = np.concatenate([self.local_sun_azimuths, local_az])
+
+        if self.reflective_index is not None:
+            local_start = np.datetime64(self.start_time.replace(tzinfo=None) + self.utc_offset, "us")
+            local_times = local_start + self.time_offsets[first:num_steps].astype("timedelta64[us]")
+            if self.weather is not None:
+                # Weather files are in local standard time.
+                dst = self.start_time.dst() or datetime.timedelta(0)
+                standard_times = local_times - np.timedelta64(int(dst.total_seconds() * 1e6), "us")
+                radiation = self.weather.get_radiation_components(standard_times, local_alt, self.reflective_index)
+            else:
+                radiation = sh._compute_radiation_components(sh._get_days_of_year(local_times), local_alt, self.reflective_index)
+            self.radiation = np.concatenate([self.radiation, np.array(radiation)], axis=1)
+
+# -----------------------------------
+# --- Vectorized Pysolar (v0.6) ---
+# -----------------------------------
+
+def _compute_julian_day(date_time):
+    ''' Same as Pysolar's julian.GetJulianDay, applied to the datetime's fields. '''
+    year, month = float(date_time.year), float(date_time.month)
+    if month <= 2.0:
+        year, month = year - 1.0, month + 12.0
+    day = date_time.day + ((date_time.hour * 3600.0) + (date_time.minute * 60.0) + date_time.second + (date_time.microsecond / 1000000.0)) / 86400.0
+    gregorian_offset = 2.0 - (year // 100.0) + ((year // 100.0) // 4.0)
+    julian_day = m.floor(365.25 * (year + 4716.0)) + m.floor(30.6001 * (month + 1.0)) + day - 1524.5
+    if julian_day <= 2299160.0:
+        return julian_day
+    return julian_day + gregorian_offset
+
+def _coefficient(jme, table):
+    return np.sum(table[:, 0] * np.cos(table[:, 1] + table[:, 2] * jme[..., np.newaxis]), axis=-1)
+
+def _series(jme, tables):
+    return sum(_coefficient(jme, table) * jme**i for i, table in enumerate(tables))
+
+def _compute_sun_altitude_azimuth(latitude_deg, longitude_deg, julian_days):
+    '''
+    Args:
+        latitude_deg (float or np.array)
+        longitude_deg (float or np.array)
+        julian_days (np.array): Broadcastable against the lat/lon.
+
+    Returns:
+        (tuple): (altitude_deg, azimuth_deg) arrays, matching solar.GetAltitude/GetAzimuth.
+    '''
+    julian_days = np.asarray(julian_days, dtype=float)
+    latitude_rad = np.radians(latitude_deg)
+
+    # Location-dependent terms (elevation 0).
+    flattened_latitude_rad = np.arctan(0.99664719 * np.tan(latitude_rad))
+    projected_radial_distance = np.cos(flattened_latitude_rad)
+    projected_axial_distance = 0.99664719 * np.sin(flattened_latitude_rad)
+
+    # Time-dependent terms.
+    jde = julian_days + 65 / 86400.0
+    jce = (jde - 2451545.0) / 36525.0
+    jme = jce / 10.0
+
+    geocentric_latitude = -np.degrees(_series(jme, _B) / 10**8)
+    geocentric_longitude = (np.degrees(_series(jme, _L) / 10**8) % 360 + 180) % 360
+    radius_vector = _series(jme, _R) / 10**8
+    aberration_correction = -20.4898 / (3600.0 * radius_vector)
+    equatorial_horizontal_parallax = 8.794 / (3600 / radius_vector)
+
+    # Nutation.
+    jce_powers = np.stack([np.ones_like(jce), jce, jce**2], axis=-1)
+    x = np.dot(jce_powers, _POLY_COEFFS[:, :3].T) + jce[..., np.newaxis]**3 / _POLY_COEFFS[:, 3]
+    sigma_rad = np.radians(np.dot(x, _ABERRATION_SIN_TERMS.T))
+    jce_col = jce[..., np.newaxis]
+    nutation_longitude = np.sum((_NUTATION_COEFFS[:, 0] + _NUTATION_COEFFS[:, 1] * jce_col) * np.sin(sigma_rad), axis=-1) / 36000000.0
+    nutation_obliquity = np.sum((_NUTATION_COEFFS[:, 2] + _NUTATION_COEFFS[:, 3] * jce_col) * np.cos(sigma_rad), axis=-1) / 36000000.0
+
+    u = jme / 10.0
+    mean_obliquity = 84381.448 - (4680.93 * u) - (1.55 * u**2) + (1999.25 * u**3) \
+        - (51.38 * u**4) - (249.67 * u**5) - (39.05 * u**6) + (7.12 * u**7) \
+        + (27.87 * u**8) + (5.79 * u**9) + (2.45 * u**10)
+    true_ecliptic_obliquity = mean_obliquity / 3600.0 + nutation_obliquity
+
+    jc = (julian_days - 2451545.0) / 36525.0
+    mean_sidereal_time = (280.46061837 + (360.98564736629 * (julian_days - 2451545.0)) + (0.000387933 * jc**2) - (jc**3 / 38710000)) % 360
+    # Pysolar takes the cosine of the obliquity in degrees here; kept for parity.
+    apparent_sidereal_time = mean_sidereal_time + nutation_longitude * np.cos(true_ecliptic_obliquity)
+
+    # Location and time.
+    apparent_sun_longitude_rad = np.radians(geocentric_longitude + nutation_longitude + aberration_correction)
+    obliquity_rad = np.radians(true_ecliptic_obliquity)
+    geocentric_latitude_rad = np.radians(geocentric_latitude)
+
+    right_ascension = np.degrees(np.arctan2(np.sin(apparent_sun_longitude_rad) * np.cos(obliquity_rad) - np.tan(geocentric_latitude_rad) * np.sin(obliquity_rad),
+                                            np.cos(apparent_sun_longitude_rad))) % 360
+    declination_rad = np.arcsin(np.sin(geocentric_latitude_rad) * np.cos(obliquity_rad) + \
+                                np.cos(geocentric_latitude_rad) * np.sin(obliquity_rad) * np.sin(apparent_sun_longitude_rad))
+
+    local_hour_angle_rad = np.radians((apparent_sidereal_time + longitude_deg - right_ascension) % 360)
+    ehp_rad = np.radians(equatorial_horizontal_parallax)
+    parallax_rad = np.arctan2(-projected_radial_distance * np.sin(ehp_rad) * np.sin(local_hour_angle_rad),
+                              np.cos(declination_rad) - projected_radial_distance * np.sin(ehp_rad) * np.cos(local_hour_angle_rad))
+    topocentric_hour_angle_rad = local_hour_angle_rad - parallax_rad
+    topocentric_declination_rad = np.arctan2((np.sin(declination_rad) - projected_axial_distance * np.sin(ehp_rad)) * np.cos(parallax_rad),
+                                             np.cos(declination_rad) - projected_axial_distance * np.sin(ehp_rad) * np.cos(local_hour_angle_rad))
+
+    # Altitude (with refraction at 25C, 1013.25mb).
+    elevation = np.degrees(np.arcsin(np.sin(latitude_rad) * np.sin(topocentric_declination_rad) + \
+                                     np.cos(latitude_rad) * np.cos(topocentric_declination_rad) * np.cos(topocentric_hour_angle_rad)))
+    refraction = (1013.25 * 283.0 * 1.02) / (1010.0 * (25 + 273.15) * 60.0 * np.tan(np.radians(elevation + (10.3 / (elevation + 5.11)))))
+    altitude = elevation + refraction
+
+    # Azimuth.
+    topocentric_azimuth = 180.0 + np.degrees(np.arctan2(np.sin(topocentric_hour_angle_rad),
+                                                        np.cos(topocentric_hour_angle_rad) * np.sin(latitude_rad) - np.tan(topocentric_declination_rad) * np.cos(latitude_rad))) % 360
+    azimuth = 180 - topocentric_azimuth
+
+    return altitude, azimuth
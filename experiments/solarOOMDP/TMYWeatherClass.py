@@ -0,0 +1,180 @@
+'''
+TMYWeatherClass.py: Contains the TMYWeather class.
+
+Measured irradiance from a Typical Meteorological Year (TMY) style CSV file,
+with one row of GHI/DNI/DHI (W/m^2) per hour of the year. Two layouts are read:
+
+    TMY3:  <site line>, then Date (MM/DD/YYYY),Time (HH:MM),...,GHI (W/m^2),...,DNI (W/m^2),...,DHI (W/m^2),...
+           (Time is the end of the hour, 01:00 - 24:00)
+    NSRDB: <optional site lines>, then Year,Month,Day,Hour,...,GHI,DNI,DHI,...
+           (Hour is the start of the hour, 0 - 23)
+
+The file is converted once (streamed row by row) to an 8760 x 3 .npy table next
+to it (or in cache_dir), which is then memory-mapped so lookups only read the
+rows they need.
+'''
+
+# Python imports.
+import os
+import csv
+import hashlib
+import tempfile
+import numpy as np
+
+class TMYWeather(object):
+    ''' Hourly measured irradiance of a typical (non-leap) year, looked up by local time. '''
+
+    HOURS_PER_YEAR = 8760
+    COLUMNS = ["GHI", "DNI", "DHI"]
+    _DAYS_BEFORE_MONTH = np.cumsum([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30])
+
+    def __init__(self, csv_path, cache_dir=None):
+        '''
+        Args:
+            csv_path (str)
+            cache_dir (str): Where the converted table is kept (default: next to @csv_path).
+        '''
+        self.csv_path = csv_path
+        cache_dir = os.path.dirname(os.path.abspath(csv_path)) if cache_dir is None else cache_dir
+        self.table_path = os.path.join(cache_dir, os.path.basename(csv_path) + ".npy")
+
+        if not os.path.isfile(self.table_path) or os.path.getmtime(self.table_path) < os.path.getmtime(csv_path):
+            self._convert()
+
+        # Hour of the year x (GHI, DNI, DHI), row h covering [h, h + 1) hours after Jan 1st 00:00.
+        self.table = np.load(self.table_path, mmap_mode="r")
+
+    def get_id(self):
+        '''
+        Returns:
+            (str): Identifies the contents of the file (for caches of values derived from it).
+        '''
+        stat = os.stat(self.csv_path)
+        return hashlib.sha1("%s:%d:%r" % (os.path.abspath(self.csv_path), stat.st_size, stat.st_mtime)).hexdigest()
+
+    # --- Lookups ---
+
+    def get_irradiance(self, local_times):
+        '''
+        Args:
+            local_times (np.array of datetime64): Local (standard) times.
+
+        Returns:
+            (tuple): (GHI, DNI, DHI) np.arrays, interpolated linearly between the middles of the hours.
+        '''
+        hours = self._get_hours_of_year(local_times) - 0.5
+        first = np.floor(hours)
+        weight = (hours - first)[:, np.newaxis]
+        first = first.astype(int) % TMYWeather.HOURS_PER_YEAR
+        second = (first + 1) % TMYWeather.HOURS_PER_YEAR
+
+        irradiance = (1 - weight) * self.table[first] + weight * self.table[second]
+
+        return irradiance[:, 0], irradiance[:, 1], irradiance[:, 2]
+
+    def get_radiation_components(self, local_times, sun_altitude_deg, reflective_index):
+        '''
+        Args:
+            local_times (np.array of datetime64): Local (standard) times.
+            sun_altitude_deg (np.array): Altitude of the sun at each time.
+            reflective_index (float)
+
+        Returns:
+            (tuple): (direct, diffuse, reflective) radiation, in the terms of
+                solar_helpers._compute_radiation_components: direct is normal to the sun (DNI),
+                diffuse is the sky radiation on the ground (DHI) and reflective is the ground albedo
+                times the global horizontal radiation (GHI).
+        '''
+        ghi, dni, dhi = self.get_irradiance(local_times)
+
+        # No beam from below the horizon (the typical year and the sun model may disagree around sunrise/sunset).
+        direct = np.where(np.asarray(sun_altitude_deg) > 0, dni, 0.0)
+
+        return direct, dhi, reflective_index * ghi
+
+    def _get_hours_of_year(self, local_times):
+        '''
+        Args:
+            local_times (np.array of datetime64)
+
+        Returns:
+            (np.array): Hours since Jan 1st 00:00 of a non-leap year (Feb 29th reads as Feb 28th).
+        '''
+        local_times = np.asarray(local_times, dtype="datetime64[us]")
+        years = local_times.astype("datetime64[Y]")
+        days = (local_times.astype("datetime64[D]") - years).astype(int)
+        seconds = (local_times - local_times.astype("datetime64[D]")).astype("timedelta64[us]").astype(float) / 1e6
+
+        year_numbers = years.astype(int) + 1970
+        leap = (year_numbers % 4 == 0) & ((year_numbers % 100 != 0) | (year_numbers % 400 == 0))
+        days = np.where(leap & (days >= 59), days - 1, days)
+
+        return days * 24 + seconds / 3600.0
+
+    # --- Conversion ---
+
+    def _get_hour_index(self, month, day, hour):
+        return (TMYWeather._DAYS_BEFORE_MONTH[month - 1] + day - 1) * 24 + hour
+
+    def _read_rows(self, csv_file):
+        '''
+        Args:
+            csv_file (file)
+
+        Returns:
+            (generator): Yields (hour of the year, [GHI, DNI, DHI]) per data row.
+        '''
+        reader = csv.reader(csv_file)
+
+        # Skip the site lines until the header.
+        for header in reader:
+            names = [name.strip().split(" (")[0] for name in header]
+            if all(column in names for column in TMYWeather.COLUMNS):
+                break
+        else:
+            raise ValueError("Error: no " + "/".join(TMYWeather.COLUMNS) + " header in " + self.csv_path + ".")
+        value_indices = [names.index(column) for column in TMYWeather.COLUMNS]
+        hour_ending = "Date" in names
+        time_indices = [names.index("Date"), names.index("Time")] if hour_ending else [names.index("Month"), names.index("Day"), names.index("Hour")]
+
+        for row in reader:
+            if not row:
+                continue
+
+            if hour_ending:
+                month, day = [int(field) for field in row[time_indices[0]].split("/")[:2]]
+                hour = int(row[time_indices[1]].split(":")[0]) - 1
+            else:
+                month, day, hour = [int(row[i]) for i in time_indices]
+
+            if month == 2 and day == 29:
+                continue
+
+            yield self._get_hour_index(month, day, hour), [float(row[i]) for i in value_indices]
+
+    def _convert(self):
+        '''
+        Summary:
+            Streams the CSV into a memory-mapped table, written under a temporary
+            name and renamed into place so concurrent readers never see a partial one.
+        '''
+        table_dir = os.path.dirname(self.table_path)
+        if not os.path.isdir(table_dir):
+            os.makedirs(table_dir)
+        temp_file, temp_path = tempfile.mkstemp(dir=table_dir, prefix=".tmp-", suffix=".npy")
+        os.close(temp_file)
+
+        table = np.lib.format.open_memmap(temp_path, mode="w+", dtype=float, shape=(TMYWeather.HOURS_PER_YEAR, len(TMYWeather.COLUMNS)))
+        seen = np.zeros(TMYWeather.HOURS_PER_YEAR, dtype=bool)
+        with open(self.csv_path) as csv_file:
+            for hour, values in self._read_rows(csv_file):
+                table[hour] = values
+                seen[hour] = True
+        table.flush()
+        del table
+
+        if not seen.all():
+            os.remove(temp_path)
+            raise ValueError("Error: " + self.csv_path + " is missing " + str(np.sum(~seen)) + " hours of the year.")
+
+        os.rename(temp_path, self.table_path)
@@ -0,0 +1,129 @@
+'''
+WeatherTraceClass.py: Contains the WeatherTrace class.
+
+Precomputes the clouds of a SolarOOMDP instance (and how much of the direct
+radiation they let through) for every step, from a seed, so that every agent
+and episode run on the instance replays the same weather by step index.
+'''
+
+# Python imports.
+import random
+import numpy as np
+
+# Local imports.
+from CloudClass import Cloud
+from CloudFieldClass import CloudField
+import solar_helpers as sh
+
+class WeatherTrace(object):
+    ''' Step-indexed table of clouds and direct radiation transmittance. '''
+
+    MAX_CLOUDS = 4 # _draw_clouds draws 0-4 clouds.
+
+    def __init__(self, seed, ephemeris, img_dims, chunk_size=2048):
+        '''
+        Args:
+            seed (hashable): Seeds the cloud draws.
+            ephemeris (SunEphemeris): Clock and sun positions of the instance.
+            img_dims (int): Size of the sky image (clouds live in its pixel coordinates).
+            chunk_size (int): Number of steps computed each time the table grows.
+        '''
+        self.rng = random.Random(seed)
+        self.ephemeris = ephemeris
+        self.img_dims = img_dims
+        self.chunk_size = chunk_size
+        self.hours_per_step = ephemeris.timestep / 60.0
+
+        # Clouds drawn each morning (D x MAX_CLOUDS, padded with zero-intensity clouds).
+        self.draws = np.zeros((7, 0, WeatherTrace.MAX_CLOUDS))
+        self.num_clouds_per_draw = []
+
+        # Per step: the draw in effect, steps since it, and the resulting clouds.
+        self.draw_indices = np.zeros(0, dtype=int)
+        self.steps_since_draw = np.zeros(0, dtype=int)
+        self.cloud_arrays = np.zeros((5, 0, WeatherTrace.MAX_CLOUDS))
+        self.transmittances = np.zeros(0)
+
+    # --- Lookups ---
+
+    def get_clouds(self, step):
+        '''
+        Returns:
+            (CloudField): The clouds at @step.
+        '''
+        self._ensure_steps(step + 1)
+        num_clouds = self.num_clouds_per_draw[self.draw_indices[step]]
+        mu_x, mu_y, sigma_x, sigma_y, intensity = self.cloud_arrays[:, step, :num_clouds]
+        dx, dy = self.draws[2:4, self.draw_indices[step], :num_clouds]
+
+        return CloudField(mu_x, mu_y, dx, dy, sigma_x, sigma_y, intensity)
+
+    def get_transmittance(self, step):
+        '''
+        Returns:
+            (float): Fraction of the direct radiation let through by the clouds at @step.
+        '''
+        self._ensure_steps(step + 1)
+        return self.transmittances[step]
+
+    # --- Table construction ---
+
+    def _draw_clouds(self):
+        '''
+        Returns:
+            (np.array): 7 x MAX_CLOUDS rows of (x, y, dx, dy, rx, ry, intensity), one column per cloud.
+        '''
+        num_clouds = self.rng.randint(0,4)
+        xs, ys, rxs, rys = [], [], [], []
+
+        # Generate info for each cloud.
+        dx, dy = 1, 0
+        for i in xrange(num_clouds):
+            xs.append(self.rng.randint(0, self.img_dims))
+            ys.append(self.rng.randint(0, self.img_dims))
+            rxs.append(self.rng.randint(3,6))
+            rys.append(self.rng.randint(2,rxs[-1]))
+
+        draw = np.zeros((7, WeatherTrace.MAX_CLOUDS))
+        draw[4:6] = 1.0
+        draw[:, :num_clouds] = [xs, ys, [dx] * num_clouds, [dy] * num_clouds, rxs, rys, [Cloud.PIX_INTENSITY] * num_clouds]
+        self.num_clouds_per_draw.append(num_clouds)
+
+        return draw
+
+    def _ensure_steps(self, num_steps):
+        if num_steps <= len(self.transmittances):
+            return
+
+        num_steps = max(num_steps, len(self.transmittances) + self.chunk_size)
+        first = len(self.transmittances)
+
+        # New clouds at the first step and every morning (after each overnight jump), moved dx, dy pixels an hour otherwise.
+        draw_indices, steps_since_draw, new_draws = [], [], []
+        draw_index, since = (self.draw_indices[-1], self.steps_since_draw[-1]) if first > 0 else (-1, 0)
+        for step in xrange(first, num_steps):
+            if step == 0 or self.ephemeris.is_night_jump(step - 1):
+                new_draws.append(self._draw_clouds())
+                draw_index, since = draw_index + 1, 0
+            else:
+                since += 1
+            draw_indices.append(draw_index)
+            steps_since_draw.append(since)
+
+        if new_draws:
+            self.draws = np.concatenate([self.draws, np.stack(new_draws, axis=1)], axis=1)
+        draw_indices, steps_since_draw = np.array(draw_indices), np.array(steps_since_draw)
+
+        x, y, dx, dy, rx, ry, intensity = self.draws[:, draw_indices]
+        hours = (steps_since_draw * self.hours_per_step)[:, np.newaxis]
+        cloud_arrays = np.stack([x + dx * hours, y + dy * hours, rx, ry, intensity])
+
+        # Transmittance around the sun of the sky image.
+        sun_altitudes, sun_azimuths = np.array([self.ephemeris.get_sun_angles(step) for step in xrange(first, num_steps)]).T
+        sun_x, sun_y = sh._get_sun_x_y(sun_azimuths, sun_altitudes, self.img_dims)
+        transmittances = sh._compute_direct_cloud_cover(tuple(cloud_arrays), sun_x, sun_y, self.img_dims)
+
+        self.draw_indices = np.concatenate([self.draw_indices, draw_indices])
+        self.steps_since_draw = np.concatenate([self.steps_since_draw, steps_since_draw])
+        self.cloud_arrays = np.concatenate([self.cloud_arrays, cloud_arrays], axis=1)
+        self.transmittances = np.concatenate([self.transmittances, transmittances])
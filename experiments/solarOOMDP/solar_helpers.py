@@ -7,11 +7,6 @@ from Pysolar import solar, radiation #capitalize to get it to work?
 
 CLOUD_DIFFUS_FACTOR = 1.0 #0.85 # 10% of light is blocked
 
-def _write_datum_to_file(mdp_name, agent, datum, datum_name):
-    out_file = open(os.path.join("..", "results", mdp_name, str(agent)) + "-" + datum_name + ".csv", "a+")
-    out_file.write(str(datum) + ",")
-    out_file.close()
-
 def _compute_sun_altitude(latitude_deg, longitude_deg, time):
     return solar.GetAltitude(latitude_deg, longitude_deg, time)
 
@@ -35,31 +30,208 @@ def _compute_radiation_reflective(time, day, reflective_index, sun_altitude_deg)
 def _compute_sky_diffusion(day):
     return 0.095 + 0.04 * m.sin(0.99*day - 99)
 
+# Per-day terms of the radiation model, keyed by day of the year (tm_yday).
+_DAY_TERMS_CACHE = {}
+
+def _get_day_terms(day):
+    '''
+    Args:
+        day (int): Day of the year (1-indexed, as in tm_yday).
+
+    Returns:
+        (tuple): (extraterrestrial flux, optical depth, sky diffusion), memoized per day.
+    '''
+    if day not in _DAY_TERMS_CACHE:
+        # Pysolar counts days from zero.
+        _DAY_TERMS_CACHE[day] = (radiation.GetApparentExtraterrestrialFlux(day - 1),
+                                 radiation.GetOpticalDepth(day - 1),
+                                 _compute_sky_diffusion(day))
+    return _DAY_TERMS_CACHE[day]
+
+def _get_days_of_year(times):
+    '''
+    Args:
+        times (datetime, list of datetime or np.array of datetime64): Local times.
+
+    Returns:
+        (int or np.array): Day of the year (1-indexed) of each time.
+    '''
+    if hasattr(times, "timetuple"):
+        return times.timetuple().tm_yday
+    if isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.datetime64):
+        return (times.astype("datetime64[D]") - times.astype("datetime64[Y]")).astype(int) + 1
+    return np.array([time.timetuple().tm_yday for time in times])
+
+def _compute_radiation_components(day, sun_altitude_deg, reflective_index):
+    '''
+    Args:
+        day (int or np.array): Day of the year (1-indexed, as in tm_yday) of the local time, see _get_days_of_year.
+        sun_altitude_deg (float or np.array)
+        reflective_index (float)
+
+    Returns:
+        (tuple): (direct, diffuse, reflective) radiation hitting the ground, with the
+            shape of the inputs; same model as the scalar functions above.
+    '''
+    if np.ndim(day) == 0 and np.ndim(sun_altitude_deg) == 0:
+        # Single value: plain floats avoid numpy's per-call overhead.
+        flux, optical_depth, sky_diffus = _get_day_terms(int(day))
+        direct = 0.0
+        if 0 < sun_altitude_deg < 180:
+            direct = max(flux * m.exp(-1 * optical_depth * (1 / m.sin(m.radians(sun_altitude_deg)))), 0.0)
+        return direct, max(sky_diffus * direct, 0.0), max(reflective_index * direct * (m.sin(m.radians(sun_altitude_deg)) + sky_diffus), 0.0)
+
+    if np.ndim(day) == 0:
+        flux, optical_depth, sky_diffus = _get_day_terms(int(day))
+    else:
+        # Look each distinct day up once.
+        unique_days, inverse = np.unique(np.asarray(day, dtype=int), return_inverse=True)
+        day_terms = np.array([_get_day_terms(d) for d in unique_days]).reshape(-1, 3)
+        flux, optical_depth, sky_diffus = day_terms[inverse].T.reshape((3,) + np.shape(day))
+
+    sun_altitude_deg = np.asarray(sun_altitude_deg, dtype=float)
+    sun_up = (sun_altitude_deg > 0) & (sun_altitude_deg < 180)
+    air_mass_ratio = 1 / np.sin(np.radians(np.where(sun_up, sun_altitude_deg, 90.0)))
+    direct = np.where(sun_up, np.maximum(flux * np.exp(-1 * optical_depth * air_mass_ratio), 0.0), 0.0)
+
+    diffuse = np.maximum(sky_diffus * direct, 0.0)
+    reflective = np.maximum(reflective_index * direct * (np.sin(np.radians(sun_altitude_deg)) + sky_diffus), 0.0)
+
+    return direct, diffuse, reflective
+
 # --- CLOUDS ---
 
-def _compute_direct_cloud_cover(clouds, sun_x, sun_y, img_dims):
+def _compute_direct_cloud_cover(cloud_arrays, sun_x, sun_y, img_dims):
+    '''
+    Args:
+        cloud_arrays (tuple): (mu_x, mu_y, sigma_x, sigma_y, intensity), each C (one frame,
+            see CloudField.get_arrays) or T x C (T frames, see _get_cloud_arrays).
+        sun_x (float or np.array): Sun column in the sky image (T values for T frames).
+        sun_y (float or np.array): Sun row in the sky image.
+        img_dims (int)
+
+    Returns:
+        (float or np.array): Fraction of the direct light of the sun that gets through the clouds.
+
+    Summary:
+        Over the pixels around the sun (as rendered by _render_sun_images), each cloud's
+        gaussian is an opacity, and the sun's light is averaged through it.
+    '''
+    single = np.ndim(sun_x) == 0
+    mu_x, mu_y, sigma_x, sigma_y, intensity = [np.atleast_2d(a)[:, :, np.newaxis] for a in cloud_arrays]
+    sun_x, sun_y = np.atleast_1d(sun_x)[:, np.newaxis], np.atleast_1d(sun_y)[:, np.newaxis]
+    sun_dim = img_dims / 8.0
+
+    # Window of pixels around the sun (T x W, masked beyond the window's end).
+    offsets = np.arange(int(np.ceil(2 * sun_dim)) + 1)
+    col_ends, row_ends = np.trunc(np.minimum(sun_x + sun_dim, img_dims)), np.trunc(np.minimum(sun_y + sun_dim, img_dims))
+    cols = np.trunc(np.maximum(sun_x - sun_dim, 0)) + offsets
+    rows = np.trunc(np.maximum(sun_y - sun_dim, 0)) + offsets
+
+    sun_cols = _gaussian(cols, sun_x, sun_dim) * (cols < col_ends)
+    sun_rows = _gaussian(rows, sun_y, sun_dim) * (rows < row_ends)
+    sun_light = sun_rows[:, :, np.newaxis] * sun_cols[:, np.newaxis, :]
+
+    # Summed cloud gaussians over the window (T x W x W).
+    cloud_rows = _gaussian(rows[:, np.newaxis, :], mu_y, sigma_y) * intensity
+    cloud_cols = _gaussian(cols[:, np.newaxis, :], mu_x, sigma_x)
+    cloud_cover = np.einsum("tci,tcj->tij", cloud_rows, cloud_cols)
+
+    total_light = sun_light.sum(axis=(1, 2))
+    transmitted = (sun_light * np.clip(1 - cloud_cover * CLOUD_DIFFUS_FACTOR, 0, 1)).sum(axis=(1, 2))
+    transmittance = np.where(total_light > 0, transmitted / np.where(total_light > 0, total_light, 1.0), 1.0)
+
+    return float(transmittance[0]) if single else transmittance
+
+def _get_cloud_arrays(cloud_fields):
+    '''
+    Args:
+        cloud_fields (list of CloudField): The clouds present in each frame.
+
+    Returns:
+        (tuple): (mu_x, mu_y, sigma_x, sigma_y, intensity), each a T x C array (padded with
+            zero-intensity clouds), where C is the largest number of clouds in a frame.
+    '''
+    num_clouds = max([len(clouds) for clouds in cloud_fields] + [1])
+    cloud_params = np.zeros((5, len(cloud_fields), num_clouds))
+    cloud_params[2:4] = 1.0
+
+    for t, clouds in enumerate(cloud_fields):
+        cloud_params[:, t, :len(clouds)] = clouds.get_arrays()
+
+    return tuple(cloud_params)
+
+# --- IMAGES ---
+
+def _get_sun_x_y(sun_angle_AZ, sun_angle_ALT, img_dims):
+    x = img_dims * (1 + np.sin(np.radians(sun_angle_AZ))) / 2
+    y = img_dims * np.sin(np.radians(sun_angle_ALT)) / 2
+    return x, y
+
+def _render_sun_images(sun_angles_AZ, sun_angles_ALT, panel_angles_ns, img_dims, cloud_arrays=None):
+    '''
+    Args:
+        sun_angles_AZ (np.array): T
+        sun_angles_ALT (np.array): T
+        panel_angles_ns (np.array): T
+        img_dims (int)
+        cloud_arrays (tuple): See _get_cloud_arrays (None for clear skies).
+
+    Returns:
+        (np.array): T x img_dims x img_dims stack of frames, indexed [t][row (altitude)][column (azimuth)].
+    '''
+    images = _render_sky_images(sun_angles_AZ, sun_angles_ALT, img_dims, cloud_arrays)
+    _apply_horizon_mask(images, panel_angles_ns, img_dims)
+
+    return images
+
+def _render_sky_images(sun_angles_AZ, sun_angles_ALT, img_dims, cloud_arrays=None):
+    '''
+    Args:
+        sun_angles_AZ (np.array): T
+        sun_angles_ALT (np.array): T
+        img_dims (int)
+        cloud_arrays (tuple): See _get_cloud_arrays (None for clear skies).
+
+    Returns:
+        (np.array): T x img_dims x img_dims stack of sky frames (sun and clouds), before the
+            panel-dependent horizon mask of _apply_horizon_mask.
+    '''
+    sun_angles_AZ, sun_angles_ALT = np.atleast_1d(sun_angles_AZ), np.atleast_1d(sun_angles_ALT)
     sun_dim = img_dims / 8.0
-    total_sun_light = 0.0
-    total_covered_light = 0.0
-    sun_x_range = range( int(max(sun_x - sun_dim, 0)), int(min(sun_x + sun_dim, img_dims)))
-    sun_y_range = range( int(max(sun_y - sun_dim, 0)), int(min(sun_y + sun_dim, img_dims)))
+    pix = np.arange(img_dims, dtype=float)
+
+    # Gaussian sun, as the outer product of the row and column gaussians.
+    x, y = _get_sun_x_y(sun_angles_AZ, sun_angles_ALT, img_dims)
+    sun_rows = _gaussian(pix[np.newaxis, :], y[:, np.newaxis], sun_dim)
+    sun_cols = _gaussian(pix[np.newaxis, :], x[:, np.newaxis], sun_dim)
+    images = np.minimum(0.6 + sun_rows[:, :, np.newaxis] * sun_cols[:, np.newaxis, :], 1.0)
 
-    for i in sun_x_range:
-        for j in sun_y_range:
-            sun_light = _gaussian(j, sun_x, sun_dim) * _gaussian(i, sun_y, sun_dim)
-            # Loop the central location of the sun and compute cloud cover:
-            cloud_cover = 0.0
-            for cloud in clouds:
-                cloud_cover += (_gaussian(j, cloud.get_mu()[0], cloud.get_sigma()[0][0]) * \
-                                    _gaussian(i, cloud.get_mu()[1], cloud.get_sigma()[1][1]) * cloud.get_intensity())
+    # Cloud cover, summed over clouds.
+    if cloud_arrays is not None:
+        mu_x, mu_y, sigma_x, sigma_y, intensity = cloud_arrays
+        cloud_rows = _gaussian(pix, mu_y[:, :, np.newaxis], sigma_y[:, :, np.newaxis]) * intensity[:, :, np.newaxis]
+        cloud_cols = _gaussian(pix, mu_x[:, :, np.newaxis], sigma_x[:, :, np.newaxis])
+        images -= np.einsum("tci,tcj->tij", cloud_rows, cloud_cols)
 
-            total_sun_light += sun_light
-            total_covered_light += (sun_light - cloud_cover*CLOUD_DIFFUS_FACTOR)
+    return images
 
-    if total_sun_light > 0 and total_covered_light > 0:
-        return float(total_covered_light) / total_sun_light
-    return 1.0
+def _apply_horizon_mask(images, panel_angles_ns, img_dims):
+    '''
+    Args:
+        images (np.array): T x img_dims x img_dims sky frames, masked in place.
+        panel_angles_ns (np.array): T
+        img_dims (int)
 
+    Returns:
+        (np.array): @images.
+    '''
+    # Backcompute the altitude of each row; below the horizon renders black.
+    pix = np.arange(img_dims, dtype=float)
+    alt_pix = 2 * pix[np.newaxis, :] / img_dims + np.sin(np.radians(np.atleast_1d(panel_angles_ns)))[:, np.newaxis]
+    images[alt_pix < 0] = 1
+
+    return images
 
 # --- Tilt Factors ---
 
@@ -101,6 +273,22 @@ def _compute_sun_vector(sun_altitude_deg, sun_azimuth_deg):
 
     return _normalize(x, y, z)
 
+def _compute_sun_vectors(sun_altitude_deg, sun_azimuth_deg):
+    '''
+    Args:
+        sun_altitude_deg (np.array)
+        sun_azimuth_deg (np.array)
+
+    Returns:
+        (np.array): N x 3, vectorized _compute_sun_vector.
+    '''
+    sun_alt_radians, sun_az_radians = np.radians(sun_altitude_deg), np.radians(sun_azimuth_deg)
+    sun_vectors = np.stack([np.sin(np.pi - sun_az_radians) * np.cos(sun_alt_radians),
+                            np.cos(np.pi - sun_az_radians) * np.cos(sun_alt_radians),
+                            np.sin(sun_alt_radians)], axis=-1)
+
+    return sun_vectors / np.linalg.norm(sun_vectors, axis=-1)[..., np.newaxis]
+
 def _compute_panel_normal_vector(panel_ns_deg, panel_ew_deg):
     panel_ns_radians, panel_ew_radians = m.radians(panel_ns_deg), m.radians(panel_ew_deg)
 
@@ -111,6 +299,36 @@ def _compute_panel_normal_vector(panel_ns_deg, panel_ew_deg):
 
     return _normalize(x, y, z)
 
+def _compute_panel_normal_vectors(panel_ns_deg, panel_ew_deg):
+    '''
+    Args:
+        panel_ns_deg (np.array)
+        panel_ew_deg (np.array)
+
+    Returns:
+        (np.array): N x 3, the unit normal of each (ns, ew) orientation.
+    '''
+    panel_ns_radians, panel_ew_radians = np.radians(panel_ns_deg), np.radians(panel_ew_deg)
+
+    normals = np.stack([np.sin(panel_ns_radians)*np.cos(panel_ew_radians),
+                        np.sin(panel_ew_radians)*np.cos(panel_ns_radians),
+                        np.cos(panel_ns_radians)*np.cos(panel_ew_radians)], axis=-1)
+
+    return normals / np.linalg.norm(normals, axis=-1)[..., np.newaxis]
+
+def _compute_direct_radiation_tilt_factors(panel_normals, sun_altitude_deg, sun_azimuth_deg):
+    '''
+    Args:
+        panel_normals (np.array): N x 3, see _compute_panel_normal_vectors.
+        sun_altitude_deg (float)
+        sun_azimuth_deg (float)
+
+    Returns:
+        (np.array): The direct radiation tilt factor of each panel normal.
+    '''
+    sun_vector = _compute_sun_vector(sun_altitude_deg, sun_azimuth_deg)
+    return np.maximum(np.dot(panel_normals, sun_vector), 0)
+
 def _normalize(x, y, z):
     tot = m.sqrt(x**2 + y**2 + z**2)
     return np.array([x / tot, y / tot, z / tot])
@@ -118,20 +336,92 @@ def _normalize(x, y, z):
 def _compute_diffuse_radiation_tilt_factor(panel_ns_deg, panel_ew_deg):
     '''
     Args:
-        panel_ns_deg (float)
-        panel_ew_deg (float)
+        panel_ns_deg (float or np.array)
+        panel_ew_deg (float or np.array)
 
     Returns:
-        (float): The diffuse radiation tilt factor.
+        (float or np.array): The diffuse radiation tilt factor.
     '''
-    ns_radians = m.radians(abs(panel_ns_deg))
-    ew_radians = m.radians(abs(panel_ew_deg))
-    diffuse_radiation_angle_factor = (m.cos(ns_radians) + m.cos(ew_radians)) / 2.0
+    ns_radians = np.radians(np.abs(panel_ns_deg))
+    ew_radians = np.radians(np.abs(panel_ew_deg))
+    diffuse_radiation_angle_factor = (np.cos(ns_radians) + np.cos(ew_radians)) / 2.0
 
     return diffuse_radiation_angle_factor
 
 def _compute_reflective_radiation_tilt_factor(panel_ns_deg, panel_ew_deg):
-    return (2 - m.cos(m.radians(panel_ns_deg)) - m.cos(m.radians(panel_ew_deg))) / 2.0
+    return (2 - np.cos(np.radians(panel_ns_deg)) - np.cos(np.radians(panel_ew_deg))) / 2.0
+
+# --- Shading ---
+
+def _compute_panel_edge_vectors(panel_normals):
+    '''
+    Args:
+        panel_normals (np.array): N x 3, see _compute_panel_normal_vectors.
+
+    Returns:
+        (tuple): (N x 3, N x 3), unit vectors along each panel's x_dim and y_dim edges.
+    '''
+    edges_x = np.cross([0.0, 1.0, 0.0], panel_normals)
+    edges_x_norm = np.linalg.norm(edges_x, axis=1)
+
+    # Panels on their side (normal along y) keep x_dim horizontal.
+    edges_x = np.where(edges_x_norm[:, np.newaxis] > 1e-9, edges_x / np.maximum(edges_x_norm, 1e-9)[:, np.newaxis], [1.0, 0.0, 0.0])
+
+    return edges_x, np.cross(panel_normals, edges_x)
+
+def _compute_shaded_fractions(panel_normals, sun_vector, neighbour_offsets, neighbour_indices, neighbour_mask, x_dim, y_dim):
+    '''
+    Args:
+        panel_normals (np.array): N x 3, see _compute_panel_normal_vectors.
+        sun_vector (np.array): 3, see _compute_sun_vector.
+        neighbour_offsets (np.array): K x 3, ground offset (meters) of each neighbour from a panel.
+        neighbour_indices (np.array): N x K, index of each panel's neighbours.
+        neighbour_mask (np.array): N x K, False where a neighbour falls outside the field.
+        x_dim (float): Panel length (meters).
+        y_dim (float): Panel width (meters).
+
+    Returns:
+        (np.array): The fraction of each panel's area in the shadow of its neighbours.
+
+    Summary:
+        Each neighbour is projected along the sun's rays onto the panel's plane,
+        and its bounding box (in the panel's edge coordinates) is overlapped with
+        the panel. This is exact when neighbours share the panel's orientation.
+        Overlapping shadows are not added up (the largest one counts).
+    '''
+    if neighbour_offsets.shape[0] == 0:
+        return np.zeros(len(panel_normals))
+
+    edges_x, edges_y = _compute_panel_edge_vectors(panel_normals)
+    normals_dot_sun = np.dot(panel_normals, sun_vector)
+    lit = normals_dot_sun > 1e-9
+    normals_dot_sun = np.where(lit, normals_dot_sun, 1.0)
+
+    def _project(vectors):
+        # N x K x 3 vectors --> along the sun's rays, onto each panel's plane.
+        heights = np.einsum("nkj,nj->nk", vectors, panel_normals) / normals_dot_sun[:, np.newaxis]
+        return vectors - heights[..., np.newaxis] * sun_vector
+
+    # Only neighbours between the panel and the sun cast a shadow on it.
+    offsets = np.broadcast_to(neighbour_offsets, neighbour_indices.shape + (3,))
+    casts_shadow = neighbour_mask & (np.einsum("nkj,nj->nk", offsets, panel_normals) > 0)
+
+    # Shadow centers, in each panel's edge coordinates.
+    centers = _project(offsets)
+    center_x = np.einsum("nkj,nj->nk", centers, edges_x)
+    center_y = np.einsum("nkj,nj->nk", centers, edges_y)
+
+    # Half extents of the shadows.
+    half_edges_x = _project(edges_x[neighbour_indices] * x_dim / 2.0)
+    half_edges_y = _project(edges_y[neighbour_indices] * y_dim / 2.0)
+    half_x = np.abs(np.einsum("nkj,nj->nk", half_edges_x, edges_x)) + np.abs(np.einsum("nkj,nj->nk", half_edges_y, edges_x))
+    half_y = np.abs(np.einsum("nkj,nj->nk", half_edges_x, edges_y)) + np.abs(np.einsum("nkj,nj->nk", half_edges_y, edges_y))
+
+    overlap_x = np.maximum(np.minimum(center_x + half_x, x_dim / 2.0) - np.maximum(center_x - half_x, -x_dim / 2.0), 0)
+    overlap_y = np.maximum(np.minimum(center_y + half_y, y_dim / 2.0) - np.maximum(center_y - half_y, -y_dim / 2.0), 0)
+    fractions = np.where(casts_shadow, overlap_x * overlap_y / (x_dim * y_dim), 0)
+
+    return np.where(lit, fractions.max(axis=1), 0.0)
 
 # --- Misc. ---
 
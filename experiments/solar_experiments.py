@@ -10,25 +10,41 @@ import datetime
 import random
 from pytz import timezone
 import argparse
+import os
+import shutil
+import time
+from multiprocessing import Pool
+import numpy as np
 
 # Other imports.
-from simple_rl.run_experiments import run_agents_on_mdp
-from simple_rl.agents import RandomAgent, FixedPolicyAgent, LinearQAgent, LinUCBAgent, QLearningAgent
+from simple_rl.run_experiments import run_agents_on_mdp, run_single_agent_on_mdp
+from simple_rl.experiments import Experiment
+from simple_rl.agents import RandomAgent, FixedPolicyAgent, LinearQAgent, QLearningAgent
 from solarOOMDP.SolarOOMDPClass import SolarOOMDP
+from solarOOMDP.SolarVectorEnvClass import SolarVectorEnv
+from solarOOMDP.SolarPanelFieldClass import SolarPanelField
+from solarOOMDP.ResultsSinkClass import ResultsSink
+from solarOOMDP.IrradianceAtlasClass import IrradianceAtlas
+from solarOOMDP.TMYWeatherClass import TMYWeather
 from SolarTrackerClass import SolarTracker
+from SolarLinUCBAgentClass import SolarLinUCBAgent
 from solarOOMDP.PanelClass import Panel
 import tracking_baselines as tb
 
-def _make_mdp(loc, percept_type, panel_step, dual_axis=False, time_per_step=15.0, reflective_index=0.35, energy_breakdown_experiment=False, instances=1):
+def _make_mdp(loc, percept_type, panel_step, dual_axis=False, time_per_step=15.0, reflective_index=0.35, energy_breakdown_experiment=False, instances=1, seed=None, skip_night=False, atlas_dir=None, weather_file=None):
     '''
     Args:
         loc (str)
-        percept_type (str): One of 'sun_percept', 'image_percept', or 'image_cloud_percept'.
+        percept_type (str): One of 'angles', 'image', 'clear_image' or 'cloudy_angles' (each gets its own results directory).
         dual_axis (bool)
         time_per_step (float): Time in minutes taken per action.
         reflective_index (float)
         energy_breakdown_experiment (bool): If true tracks energy breakdown.
-        instances
+        instances (int): Number of instances (each with its own location draw, for usa_avg, and weather).
+        seed (int): If given, seeds the location draws and the weather.
+        skip_night (bool): If true, the clock skips from sunset to sunrise (instead of a fixed overnight jump).
+        atlas_dir (str): If given, sun positions and clear-sky radiation are cached on disk there (see IrradianceAtlas).
+        weather_file (str): If given, radiation is read from this TMY CSV file of the location (see TMYWeather).
 
     Returns:
         (solarOOMDP)
@@ -52,9 +68,11 @@ def _make_mdp(loc, percept_type, panel_step, dual_axis=False, time_per_step=15.0
         image_mode, cloud_mode, = {
             "angles":(False, False),
             "image":(True, True),
+            "clear_image":(True, False),
+            "cloudy_angles":(False, True),
         }[percept_type]
     except KeyError:
-        print "Error: percept type unknown ('" + str(percept_type) + "''). Choose one of: ['angles', 'image']."
+        print "Error: percept type unknown ('" + str(percept_type) + "''). Choose one of: ['angles', 'image', 'clear_image', 'cloudy_angles']."
         quit()
 
     # Location.
@@ -102,9 +120,10 @@ def _make_mdp(loc, percept_type, panel_step, dual_axis=False, time_per_step=15.0
         date_time = datetime.datetime(day=1, hour=10, month=7, year=2020)
         localtz = timezone('America/New_York')
         lat_list, lon_list = [], []
+        rng = random if seed is None else random.Random(seed)
 
         for i in xrange(instances):
-            next_lat, next_lon = (random.uniform(30,50), random.uniform(80,120))
+            next_lat, next_lon = (rng.uniform(30,50), rng.uniform(80,120))
             lat_list.append(next_lat)
             lon_list.append(next_lon)
 
@@ -112,7 +131,7 @@ def _make_mdp(loc, percept_type, panel_step, dual_axis=False, time_per_step=15.0
 
     local_date_time = localtz.localize(date_time)
 
-    mode_dict = {'dual_axis':dual_axis, 'image_mode':image_mode, 'cloud_mode':cloud_mode}
+    mode_dict = {'dual_axis':dual_axis, 'image_mode':image_mode, 'cloud_mode':cloud_mode, 'compact_state':image_mode, 'skip_night':skip_night}
 
     if energy_breakdown_experiment:
         loc += "-energy"
@@ -126,10 +145,65 @@ def _make_mdp(loc, percept_type, panel_step, dual_axis=False, time_per_step=15.0
                             longitude_deg=lon,
                             panel_step=panel_step,
                             reflective_index=reflective_index,
-                            mode_dict=mode_dict)
+                            mode_dict=mode_dict,
+                            seed=seed,
+                            instances=instances,
+                            weather=TMYWeather(weather_file) if weather_file is not None else None,
+                            atlas=IrradianceAtlas(atlas_dir) if atlas_dir is not None else None)
 
     return solar_mdp
 
+def _make_vector_env(solar_mdp):
+    '''
+    Args:
+        solar_mdp (SolarOOMDP)
+
+    Returns:
+        (SolarVectorEnv): One instance per location of @solar_mdp (each usa_avg draw, or its single location).
+    '''
+    if solar_mdp.name_ext == "usa_avg":
+        lat_list, lon_list = solar_mdp.lat_list, solar_mdp.lon_list
+    else:
+        lat_list, lon_list = [solar_mdp.latitude_deg], [solar_mdp.longitude_deg]
+
+    return SolarVectorEnv(panel=solar_mdp.panel,
+                            date_time=solar_mdp.init_time,
+                            latitudes_deg=lat_list,
+                            longitudes_deg=lon_list,
+                            timestep=solar_mdp.timestep,
+                            panel_step=solar_mdp.panel_step,
+                            reflective_index=solar_mdp.reflective_index,
+                            img_dims=solar_mdp.img_dims,
+                            dual_axis=solar_mdp.dual_axis,
+                            image_mode=solar_mdp.image_mode,
+                            skip_night=solar_mdp.skip_night)
+
+def _make_panel_field(solar_mdp, rows=10, columns=10, row_spacing=3.0, column_spacing=3.0):
+    '''
+    Args:
+        solar_mdp (SolarOOMDP)
+        rows (int)
+        columns (int)
+        row_spacing (float): meters
+        column_spacing (float): meters
+
+    Returns:
+        (SolarPanelField): A rows x columns field of @solar_mdp's panel, at its (current) location.
+    '''
+    return SolarPanelField(panel=solar_mdp.panel,
+                            date_time=solar_mdp.init_time,
+                            latitude_deg=solar_mdp.latitude_deg,
+                            longitude_deg=solar_mdp.longitude_deg,
+                            rows=rows,
+                            columns=columns,
+                            row_spacing=row_spacing,
+                            column_spacing=column_spacing,
+                            timestep=solar_mdp.timestep,
+                            panel_step=solar_mdp.panel_step,
+                            reflective_index=solar_mdp.reflective_index,
+                            dual_axis=solar_mdp.dual_axis,
+                            skip_night=solar_mdp.skip_night)
+
 def _setup_agents(solar_mdp):
     '''
     Args:
@@ -146,14 +220,14 @@ def _setup_agents(solar_mdp):
     optimal_agent = FixedPolicyAgent(tb.optimal_policy, name="optimal")
 
     # Grena single axis and double axis trackers from time/loc.
-    grena_tracker = SolarTracker(tb.grena_tracker, panel_step=panel_step, dual_axis=solar_mdp.dual_axis, actions=solar_mdp.get_bandit_actions())
+    grena_tracker = SolarTracker(tb.grena_tracker, panel_step=panel_step, dual_axis=solar_mdp.dual_axis, actions=solar_mdp.get_bandit_actions(), batch_tracker=tb.grena_tracker_batch)
     grena_tracker_agent = FixedPolicyAgent(grena_tracker.get_policy(), name="grena-tracker")
 
     # Setup RL agents
     alpha, epsilon = 0.1, 0.05
     rand_init = True
     num_features = solar_mdp.get_num_state_feats()
-    lin_ucb_agent = LinUCBAgent(solar_mdp.get_bandit_actions(), context_size=num_features, name="lin-ucb", rand_init=rand_init, alpha=2.0)
+    lin_ucb_agent = SolarLinUCBAgent(solar_mdp.get_bandit_actions(), context_size=num_features, name="lin-ucb", rand_init=rand_init, alpha=2.0)
     # sarsa_agent_g0 = LinearSarsaAgent(actions, num_features=num_features, name="sarsa-lin-g0", rand_init=rand_init, alpha=alpha, epsilon=epsilon, gamma=0, rbf=False, anneal=True)
     # sarsa_agent = LinearSarsaAgent(actions, num_features=num_features, name="sarsa-lin", rand_init=rand_init, alpha=alpha, epsilon=epsilon, gamma=gamma, rbf=False, anneal=True)
     ql_agent = QLearningAgent(actions, alpha=alpha, epsilon=epsilon, gamma=gamma)
@@ -165,7 +239,7 @@ def _setup_agents(solar_mdp):
 
     return agents
 
-def setup_experiment(percept_type, loc="australia", dual_axis=False, panel_step=2.0, time_per_step=15.0, reflective_index=0.35, energy_breakdown_experiment=False, instances=1):
+def setup_experiment(percept_type, loc="australia", dual_axis=False, panel_step=2, time_per_step=15.0, reflective_index=0.35, energy_breakdown_experiment=False, instances=1, seed=None, skip_night=False, atlas_dir=None, weather_file=None):
     '''
     Args:
         percept_type (str): One of 'angles', 'image'.
@@ -176,6 +250,10 @@ def setup_experiment(percept_type, loc="australia", dual_axis=False, panel_step=
         reflective_index (float): In [0:1], determines the albedo of the nearby ground.
         energy_breakdown_experiment (bool): If true, tracks which energy types are leading to reward.
         instances (int)
+        seed (int)
+        skip_night (bool)
+        atlas_dir (str)
+        weather_file (str)
 
     Returns:
         (tuple):
@@ -184,11 +262,246 @@ def setup_experiment(percept_type, loc="australia", dual_axis=False, panel_step=
     '''
 
     # Setup MDP, agents
-    solar_mdp = _make_mdp(loc, percept_type, panel_step=panel_step, dual_axis=dual_axis, time_per_step=time_per_step, reflective_index=reflective_index, energy_breakdown_experiment=energy_breakdown_experiment, instances=instances)
+    solar_mdp = _make_mdp(loc, percept_type, panel_step=panel_step, dual_axis=dual_axis, time_per_step=time_per_step, reflective_index=reflective_index, energy_breakdown_experiment=energy_breakdown_experiment, instances=instances, seed=seed, skip_night=skip_night, atlas_dir=atlas_dir, weather_file=weather_file)
     agents = _setup_agents(solar_mdp)
     
     return agents, solar_mdp
 
+# ----------------------
+# --- Lockstep runner ---
+# ----------------------
+
+def _run_agents_in_lockstep(agents, solar_mdp, episodes, steps, experiment, bucket_counters=None):
+    '''
+    Args:
+        agents (list of Agents)
+        solar_mdp (SolarOOMDP): Set to the instance to run.
+        episodes (int)
+        steps (int)
+        experiment (Experiment)
+        bucket_counters (dict): Agent --> its reward bucket counters in @experiment, carried across instances.
+
+    Summary:
+        Runs every agent on the current instance of @solar_mdp at once: each step, all agents act and
+        then advance together (see SolarOOMDP.execute_agent_actions). Results are written to @experiment
+        agent by agent at the end, in the order run_single_agent_on_mdp would have written them. The
+        experiment's counters of rewards summed per rew_step_count are kept per agent, so partial sums
+        don't spill over from one agent to the next. Each agent's step time is its act time plus an
+        even share of the shared step.
+    '''
+    # Per agent, the (reward, time) of every step of every episode.
+    experiences = [[] for agent in agents]
+
+    for episode in xrange(episodes):
+        states = [solar_mdp.get_init_state()] * len(agents)
+        last_rewards = [0] * len(agents)
+
+        for step in xrange(steps):
+            actions, act_times = [], []
+            for i, agent in enumerate(agents):
+                act_start = time.clock()
+                actions.append(agent.act(states[i], last_rewards[i]))
+                act_times.append(time.clock() - act_start)
+
+            step_start = time.clock()
+            last_rewards, states = solar_mdp.execute_agent_actions(states, actions)
+            shared_time = (time.clock() - step_start) / len(agents)
+            for i in xrange(len(agents)):
+                experiences[i].append((last_rewards[i], act_times[i] + shared_time))
+
+        # A final update.
+        for i, agent in enumerate(agents):
+            agent.act(states[i], last_rewards[i])
+            agent.end_of_episode()
+        solar_mdp.reset()
+
+    bucket_counters = {} if bucket_counters is None else bucket_counters
+    for agent, agent_experiences in zip(agents, experiences):
+        experiment.rew_since_count, experiment.steps_since_added_r = bucket_counters.get(agent, (0, 1))
+        for episode in xrange(episodes):
+            for reward, time_taken in agent_experiences[episode * steps:(episode + 1) * steps]:
+                experiment.add_experience(agent, None, None, round(reward, 5), None, time_taken=time_taken)
+            experiment.end_of_episode(agent)
+        experiment.end_of_instance(agent)
+        bucket_counters[agent] = (experiment.rew_since_count, experiment.steps_since_added_r)
+
+def run_agents_in_lockstep(agents, solar_mdp, instances, episodes, steps, rew_step_count=1, dir_for_plot="results", open_plot=True):
+    '''
+    Args:
+        agents (list of Agents)
+        solar_mdp (SolarOOMDP)
+        instances (int)
+        episodes (int)
+        steps (int)
+        rew_step_count (int)
+        dir_for_plot (str)
+        open_plot (bool)
+
+    Summary:
+        Same as run_agents_on_mdp, but runs all agents through each instance together, so
+        the clock, sun, radiation and weather of every step are looked up once for all agents
+        instead of once per agent. Agents see the same instances (locations, clocks and weather)
+        they would in run_agents_on_mdp, checked by check_instance_parity.py.
+    '''
+    if solar_mdp.results_sink is not None:
+        raise ValueError("Error: the energy breakdown is logged per agent, and can't be logged by the lockstep runner.")
+
+    experiment = Experiment(agents=agents,
+                            mdp=solar_mdp,
+                            params={"instances":instances, "episodes":episodes, "steps":steps},
+                            is_episodic=episodes > 1,
+                            clear_old_results=True,
+                            count_r_per_n_timestep=rew_step_count,
+                            dir_for_plot=dir_for_plot)
+    print "Running experiment: \n" + str(experiment)
+
+    _run_instances_in_lockstep(agents, solar_mdp, instances, episodes, steps, experiment)
+
+    experiment.make_plots(open_plot=open_plot)
+
+def _run_instances_in_lockstep(agents, solar_mdp, instances, episodes, steps, experiment):
+    '''
+    Summary:
+        Runs the agents in lockstep through instances 0 to @instances - 1 of @solar_mdp,
+        writing their results to @experiment (see run_agents_in_lockstep).
+    '''
+    bucket_counters = {}
+    for instance in xrange(instances):
+        print "  Instance " + str(instance + 1) + " of " + str(instances) + "."
+        solar_mdp.set_instance(instance)
+        _run_agents_in_lockstep(agents, solar_mdp, episodes, steps, experiment, bucket_counters)
+        for agent in agents:
+            agent.reset()
+
+        if solar_mdp.get_profiler() is not None:
+            solar_mdp.print_profile()
+            solar_mdp.get_profiler().reset()
+
+# --------------------------------
+# --- Instance-parallel runner ---
+# --------------------------------
+
+def _get_instance_seed(seed, instance):
+    return hash((seed, instance))
+
+def _run_instance(job):
+    '''
+    Args:
+        job (tuple): (experiment_kwargs, instance, seed, episodes, steps, rew_step_count, instance_dir, breakdown_dir, lockstep)
+
+    Returns:
+        (str): The directory holding this instance's results.
+
+    Summary:
+        Runs every agent on one instance (in a worker process). Everything random in the
+        instance is seeded from (seed, instance) only, so results don't depend on the worker count.
+    '''
+    experiment_kwargs, instance, seed, episodes, steps, rew_step_count, instance_dir, breakdown_dir, lockstep = job
+    instance_seed = _get_instance_seed(seed, instance)
+    random.seed(instance_seed)
+    np.random.seed(instance_seed % 2**32)
+
+    agents, solar_mdp = setup_experiment(seed=seed, **experiment_kwargs)
+    experiment = Experiment(agents=agents,
+                            mdp=solar_mdp,
+                            params={"instances":1, "episodes":episodes, "steps":steps},
+                            is_episodic=episodes > 1,
+                            count_r_per_n_timestep=rew_step_count,
+                            dir_for_plot=instance_dir)
+
+    if lockstep:
+        solar_mdp.set_instance(instance, seed=instance_seed)
+        _run_agents_in_lockstep(agents, solar_mdp, episodes, steps, experiment)
+        return experiment.exp_directory
+
+    results_sink = None
+    if breakdown_dir is not None:
+        results_sink = ResultsSink(breakdown_dir)
+        solar_mdp.set_results_sink(results_sink)
+
+    for agent in agents:
+        if results_sink is not None:
+            results_sink.begin(str(agent), instance)
+        solar_mdp.set_instance(instance, seed=instance_seed)
+        run_single_agent_on_mdp(agent, solar_mdp, episodes, steps, experiment)
+        agent.reset()
+
+    if results_sink is not None:
+        results_sink.close()
+
+    return experiment.exp_directory
+
+def _make_results_sink(experiment_dir, agents, instances):
+    '''
+    Returns:
+        (ResultsSink): Writing to <experiment_dir>/breakdown (cleared first).
+    '''
+    breakdown_dir = os.path.join(experiment_dir, "breakdown")
+    if os.path.isdir(breakdown_dir):
+        shutil.rmtree(breakdown_dir)
+
+    return ResultsSink(breakdown_dir, agent_names=[str(agent) for agent in agents], instances=instances)
+
+def run_instances_in_parallel(experiment_kwargs, instances, episodes, steps, rew_step_count=1, workers=None, seed=None, dir_for_plot="results", open_plot=True, log_breakdown=False, lockstep=False):
+    '''
+    Args:
+        experiment_kwargs (dict): Arguments of setup_experiment (other than seed).
+        instances (int)
+        episodes (int)
+        steps (int)
+        rew_step_count (int)
+        workers (int): Number of worker processes (defaults to the number of cores).
+        seed (int): If None, one is drawn (and printed).
+        dir_for_plot (str)
+        open_plot (bool)
+        log_breakdown (bool): If true, logs each step's energy breakdown (see ResultsSink).
+        lockstep (bool): If true, each worker runs the agents of an instance together (see run_agents_in_lockstep).
+
+    Summary:
+        Same as run_agents_on_mdp, but runs the instances across a pool of processes and
+        merges their results into the usual results/<mdp>/<agent>.csv layout (one line per instance).
+    '''
+    if lockstep and log_breakdown:
+        raise ValueError("Error: the energy breakdown is logged per agent, and can't be logged by the lockstep runner.")
+
+    seed = random.randint(0, 2**31 - 1) if seed is None else seed
+    agents, solar_mdp = setup_experiment(seed=seed, **experiment_kwargs)
+    experiment = Experiment(agents=agents,
+                            mdp=solar_mdp,
+                            params={"instances":instances, "episodes":episodes, "steps":steps, "seed":seed},
+                            is_episodic=episodes > 1,
+                            clear_old_results=True,
+                            count_r_per_n_timestep=rew_step_count,
+                            dir_for_plot=dir_for_plot)
+    print "Running experiment: \n" + str(experiment)
+
+    # Run the instances.
+    instances_dir = os.path.join(experiment.exp_directory, "instances")
+    breakdown_dir = _make_results_sink(experiment.exp_directory, agents, instances).results_dir if log_breakdown else None
+    jobs = [(experiment_kwargs, i, seed, episodes, steps, rew_step_count, os.path.join(instances_dir, str(i)), breakdown_dir, lockstep) for i in xrange(instances)]
+    pool = Pool(workers)
+    try:
+        instance_dirs = pool.map(_run_instance, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+    # Merge, in instance order.
+    for agent in agents:
+        for sub_dir in ["", "times"]:
+            instance_files = [os.path.join(instance_dir, sub_dir, str(agent) + ".csv") for instance_dir in instance_dirs]
+            if not all([os.path.exists(instance_file) for instance_file in instance_files]):
+                continue
+            if not os.path.isdir(os.path.join(experiment.exp_directory, sub_dir)):
+                os.makedirs(os.path.join(experiment.exp_directory, sub_dir))
+            out_file = open(os.path.join(experiment.exp_directory, sub_dir, str(agent) + ".csv"), "a+")
+            for instance_file in instance_files:
+                out_file.write(open(instance_file, "r").read())
+            out_file.close()
+    shutil.rmtree(instances_dir)
+
+    experiment.make_plots(open_plot=open_plot)
+
 def parse_args():
     '''
     Summary:
@@ -196,11 +509,27 @@ def parse_args():
     '''
     parser = argparse.ArgumentParser()
     parser.add_argument("-loc", type = str, default = "australia", nargs = '?', help = "Choose the location for the experiment.")
-    parser.add_argument("-percept", type = str, default = "angles", nargs = '?', help = "One of {angles, image}.")
+    parser.add_argument("-percept", type = str, default = "angles", nargs = '?', help = "One of {angles, image, clear_image, cloudy_angles}.")
     parser.add_argument("-dual_axis", type = bool, default = False, nargs = '?', help = "If true uses dual axis tracker.")
+    parser.add_argument("-panel_step", type = int, default = None, nargs = '?', help = "Degrees per panel move (default: 10, dual: 20).")
+    parser.add_argument("-time_per_step", type = float, default = None, nargs = '?', help = "Minutes per step (default: 10, dual: 20).")
+    parser.add_argument("-num_days", type = int, default = 200, nargs = '?', help = "Number of simulated days per episode.")
+    parser.add_argument("-instances", type = int, default = 50, nargs = '?', help = "Number of instances.")
+    parser.add_argument("-episodes", type = int, default = None, nargs = '?', help = "Number of episodes (default: 1, dual: 100).")
+    parser.add_argument("-reflective_index", type = float, default = 0.55, nargs = '?', help = "Albedo of the nearby ground.")
+    parser.add_argument("-results_dir", type = str, default = "results", nargs = '?', help = "Directory results are written to.")
+    parser.add_argument("-open_plot", type = int, default = 1, nargs = '?', help = "If 0, doesn't open the plot when finished.")
+    parser.add_argument("-workers", type = int, default = None, nargs = '?', help = "If set, runs the instances in parallel on this many processes.")
+    parser.add_argument("-seed", type = int, default = None, nargs = '?', help = "Seed for the instance-parallel mode.")
+    parser.add_argument("-log_breakdown", type = int, default = 0, nargs = '?', help = "If 1, logs the per-step energy breakdown to <results>/breakdown.")
+    parser.add_argument("-skip_night", type = int, default = 0, nargs = '?', help = "If 1, skips from sunset straight to sunrise (instead of jumping 13 hours after 4pm).")
+    parser.add_argument("-atlas_dir", type = str, default = None, nargs = '?', help = "If set, caches sun positions and clear-sky radiation in this directory.")
+    parser.add_argument("-weather_file", type = str, default = None, nargs = '?', help = "If set, reads the radiation from this TMY CSV file (GHI/DNI/DHI per hour) of the location.")
+    parser.add_argument("-lockstep", type = int, default = 0, nargs = '?', help = "If 1, runs all agents through each instance together, sharing the environment computation.")
+    parser.add_argument("-profile", type = int, default = 0, nargs = '?', help = "If 1, prints the time spent in each simulator phase after every instance.")
     args = parser.parse_args()
 
-    return args.loc, args.percept, args.dual_axis
+    return args
 
 def main():
 
@@ -213,25 +542,41 @@ def main():
         # episodes = 50, dual: 100
 
     # Setup experiment parameters, agents, mdp.
-    num_days = 200
+    args = parse_args()
+    loc, percept_type, dual_axis = args.loc, args.percept, args.dual_axis
+    num_days = args.num_days
     per_hour = True
-    loc, percept_type, dual_axis = parse_args()
-    time_per_step = 10.0 if not dual_axis else 20.0 # in minutes.
+    time_per_step = args.time_per_step or (10.0 if not dual_axis else 20.0) # in minutes.
     steps = int(24*(60 / time_per_step)*num_days)
-    panel_step = 10 if not dual_axis else 20
-    reflective_index = 0.55
+    panel_step = args.panel_step or (10 if not dual_axis else 20)
+    reflective_index = args.reflective_index
 
     # Set experiment # episodes and # instances.
     episodes = 1 if not dual_axis else 100
     episodes = 1 if num_days == 365 else episodes
-    instances = 50
+    episodes = args.episodes or episodes
+    instances = args.instances
 
     # If per hour is true, plots every hour long reward chunk, otherwise every day.
     rew_step_count = (steps / num_days ) / 24 if per_hour else (steps / num_days)
-    sun_agents, sun_solar_mdp = setup_experiment(percept_type=percept_type, loc=loc, dual_axis=dual_axis, panel_step=panel_step, time_per_step=time_per_step, reflective_index=reflective_index, instances=instances)
+    experiment_kwargs = {"percept_type":percept_type, "loc":loc, "dual_axis":dual_axis, "panel_step":panel_step, "time_per_step":time_per_step, "reflective_index":reflective_index, "instances":instances, "skip_night":bool(args.skip_night), "atlas_dir":args.atlas_dir, "weather_file":args.weather_file}
+
+    if args.workers is not None:
+        run_instances_in_parallel(experiment_kwargs, instances=instances, episodes=episodes, steps=steps, rew_step_count=rew_step_count, workers=args.workers, seed=args.seed, dir_for_plot=args.results_dir, open_plot=bool(args.open_plot), log_breakdown=bool(args.log_breakdown), lockstep=bool(args.lockstep))
+        return
+
+    sun_agents, sun_solar_mdp = setup_experiment(**experiment_kwargs)
+    if args.log_breakdown:
+        results_sink = _make_results_sink(os.path.join(args.results_dir, str(sun_solar_mdp)), sun_agents, instances)
+        sun_solar_mdp.set_results_sink(results_sink)
+    if args.profile:
+        sun_solar_mdp.enable_profiling()
 
     # Run experiments.
-    run_agents_on_mdp(sun_agents, sun_solar_mdp, instances=instances, episodes=episodes, steps=steps, clear_old_results=True, rew_step_count=rew_step_count, verbose=True)
+    if args.lockstep:
+        run_agents_in_lockstep(sun_agents, sun_solar_mdp, instances=instances, episodes=episodes, steps=steps, rew_step_count=rew_step_count, dir_for_plot=args.results_dir, open_plot=bool(args.open_plot))
+        return
+    run_agents_on_mdp(sun_agents, sun_solar_mdp, instances=instances, episodes=episodes, steps=steps, clear_old_results=True, rew_step_count=rew_step_count, verbose=True, open_plot=bool(args.open_plot), dir_for_plot=args.results_dir)
 
 if __name__ == "__main__":
     main()
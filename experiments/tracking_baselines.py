@@ -157,6 +157,72 @@ def grena_tracker(state):
 
     return altitude_estimate, azimuth_estimate
 
+def grena_tracker_batch(states):
+    '''
+    Args:
+        states (list of OOMDPstate)
+
+    Returns:
+        (tuple): (altitudes, azimuths), np.arrays matching grena_tracker on each state.
+    '''
+    date_time_objs = [state.get_date_time() + state.get_date_time().utcoffset() for state in states]
+    year = numpy.array([d.year for d in date_time_objs], dtype=float)
+    month = numpy.array([d.month for d in date_time_objs], dtype=float)
+    day = numpy.array([d.day for d in date_time_objs], dtype=float)
+    hour = numpy.array([d.hour for d in date_time_objs], dtype=float)
+    latitude_deg = numpy.array([state.get_latitude() for state in states], dtype=float)
+    longitude_deg = numpy.array([state.get_longitude() for state in states], dtype=float)
+
+    return _grena_sun_position(year, month, day, hour, latitude_deg, longitude_deg)
+
+def _grena_sun_position(year, month, day, hour, latitude_deg, longitude_deg):
+    '''
+    Args:
+        year, month, day, hour, latitude_deg, longitude_deg (np.array)
+
+    Summary:
+        Vectorized version of the computation in grena_tracker.
+    '''
+    latitude_rad, longitude_rad = numpy.radians(latitude_deg), numpy.radians(longitude_deg)
+    year, month = numpy.where(month <= 2, year - 1, year), numpy.where(month <= 2, month + 12, month)
+
+    t = numpy.trunc(365.25*(year-2000) + numpy.trunc(30.6001*(month+1)) - numpy.trunc(0.01*year) + day) + 0.0416667*hour - 21958.0
+    te = t + 1.1574e-5*70
+
+    wte = 0.017202786*te
+    s1, c1 = numpy.sin(wte), numpy.cos(wte)
+    s2 = 2 *s1 *c1
+    c2 = (c1 + s1) * (c1 - s1)
+    s3 = s2*c1 + c2*s1
+    c3 = c2*c1 - s2*s1
+    s4 = 2.0*s2*c2
+    c4 = (c2+s2)*(c2-s2)
+
+    pi_2 = 2 * m.pi
+
+    right_asc = -1.38880 + 1.72027920e-2*te + 3.199e-2*s1 - 2.65e-3*c1 + 4.050e-2*s2 + 1.525e-2*c2 + 1.33e-3*s3 + 3.8e-4*c3 + 7.3e-4*s4 + 6.2e-4*c4
+    right_asc = right_asc % pi_2
+    decl = 6.57e-3 + 7.347e-2*s1 - 3.9919e-1*c1 + 7.3e-4*s2 - 6.60e-3*c2 + 1.50e-3*s3 - 2.58e-3*c3 + 6e-5*s4 - 1.3e-4*c4 + 0.2967
+    hour_angle = 1.75283 + 6.3003881*t + longitude_rad - right_asc
+    hour_angle = ((hour_angle + m.pi) % pi_2) - m.pi
+
+    sp = numpy.sin(latitude_rad)
+    cp = numpy.sqrt((1-sp*sp))
+    sd = numpy.sin(decl)
+    cd = numpy.sqrt(1-sd*sd)
+    sH = numpy.sin(hour_angle)
+    cH = numpy.cos(hour_angle)
+    azimuth_estimate = numpy.arctan2(sH, cH*sp - sd*cp/cd)
+
+    # Flip axis direction.
+    azimuth_estimate = -((360 + numpy.degrees(azimuth_estimate)) % 360)
+
+    # Estimate altitude.
+    altitude_estimate = numpy.degrees(numpy.arcsin(numpy.cos(latitude_rad) * numpy.cos(decl) * \
+                        numpy.cos(hour_angle) + numpy.sin(latitude_rad) * numpy.sin(decl)))
+
+    return altitude_estimate, azimuth_estimate
+
 def _final_step(right_asc, declination, hour_angle, latitude, longitude):
     '''
     Args: